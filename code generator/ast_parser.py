@@ -28,7 +28,7 @@ class ASTParser:
             self.get_line()  # Skip header
             class_map = self.get_list(self.get_class_map)
             self.get_line()  # Skip separator
-            implementation_map = self.get_list(self.get_implementation_map)
+            implementation_map = self.resolve_shared_bodies(self.get_list(self.get_implementation_map))
             self.get_line()  # Skip separator
             parent_map = self.get_list(self.get_parent_map)
             program_classlist = self.get_list(self.get_class)
@@ -64,8 +64,9 @@ class ASTParser:
         type_ = self.get_id()
         return (name, type_)
 
-    def _get_expr(self):
-        line = self.get_line()
+    def _get_expr(self, line=None):
+        if line is None:
+            line = self.get_line()
         type_ = self.get_line()
         tag = self.get_line()
 
@@ -183,7 +184,12 @@ class ASTParser:
         name = self.get_line()
         formals = self.get_list(self.get_line)
         type_ = self.get_line()
-        body = self.get_expr()
+        line = self.get_line()
+        if line == 'inherited':
+            # Shared implementation map, the body is the defining class's
+            body = None
+        else:
+            body = self.get_expr(line)
         return (name, formals, type_, body)
 
     def _get_implementation_map(self):
@@ -191,6 +197,21 @@ class ASTParser:
         methods = self.get_list(self.get_implementation_map_method)
         return (name, methods)
 
+    def resolve_shared_bodies(self, implementation_map):
+        # Replaces each inherited entry of an implementation_map_shared
+        # section with the body written under its defining class. The
+        # plain format has no inherited entries and is returned as is.
+        bodies = {}
+        for (cname, methods) in implementation_map:
+            for m in methods:
+                if m[3] is not None:
+                    bodies[(m[2], m[0])] = m[3]
+        resolved = []
+        for (cname, methods) in implementation_map:
+            methods = [m if m[3] is not None else m[:3] + (bodies[(m[2], m[0])],) for m in methods]
+            resolved.append((cname, methods))
+        return resolved
+
     def _get_parent_map(self):
         name = self.get_line()
         parent = self.get_line()
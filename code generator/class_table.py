@@ -1,8 +1,49 @@
 # class_table.py
 
+class VTableLayout:
+    # Method slots of one class. A class starts from a copy of its parent's
+    # slots, an overriding method takes over the slot of the method it
+    # overrides and new methods are appended, so a method has the same slot
+    # in every subclass. In the emitted vtable the constructor comes first.
+    def __init__(self, class_name, parent_layout, declared_methods):
+        self.class_name = class_name
+        if parent_layout is None:
+            self.methods = []
+            self.slots = {}
+        else:
+            self.methods = list(parent_layout.methods)
+            self.slots = dict(parent_layout.slots)
+        for method in declared_methods:
+            slot = self.slots.get(method[0])
+            if slot is None:
+                self.slots[method[0]] = len(self.methods)
+                self.methods.append(method)
+            else:
+                self.methods[slot] = method
+
+    def index(self, method_name):
+        # Slot of the method among the methods, or -1 if it is not found
+        return self.slots.get(method_name, -1)
+
+    def offset(self, method_name):
+        # Byte offset of the method in the vtable, past the constructor
+        slot = self.slots.get(method_name)
+        if slot is None:
+            return None
+        return (slot + 1) * 8
+
+    def defining_class(self, method_name):
+        return self.methods[self.slots[method_name]][4]
+
+    def label(self, method_name):
+        return f"{self.defining_class(method_name)}.{method_name}"
+
 class ClassTable:
     def __init__(self):
         self.data = {}
+        # Per-class object layout (see layout), cleared whenever a class or
+        # feature is added
+        self.layouts = {}
         # Initialize predefined classes
         self.data['Object'] = {
             'parent': None,
@@ -41,6 +82,7 @@ class ClassTable:
         if parent_name is None:
             parent_name = 'Object'
         self.data[name] = { 'parent': parent_name, 'attribs': [], 'methods': [] }
+        self.invalidate_layouts()
 
     def get_class(self, name):
         return name if name in self.data else None
@@ -56,6 +98,7 @@ class ClassTable:
             print(f"Error: Class {cname} not defined.")
             exit()
         self.data[cname]['attribs'].append((aname, type_, init))
+        self.invalidate_layouts()
 
     def get_attribute(self, cname, aname):
         for a in self.data[cname]['attribs']:
@@ -71,9 +114,37 @@ class ClassTable:
             return a
         return self.find_attribute(self.get_parent(cname), aname)
 
+    def invalidate_layouts(self):
+        self.layouts.clear()
+
+    def layout(self, name):
+        # Attributes in object order, the index of each by name and the
+        # VTableLayout. Building a class asks for its parent first, so every
+        # class is computed once per change of the table.
+        layout = self.layouts.get(name)
+        if layout is None:
+            attributes = self.build_all_attributes(name)
+            attribute_index = {}
+            for index, attribute in enumerate(attributes):
+                attribute_index.setdefault(attribute[0][1], index)
+            parent = self.get_parent(name)
+            parent_vtable = self.vtable(parent) if parent is not None else None
+            vtable = VTableLayout(name, parent_vtable, self.data[name]['methods'])
+            layout = (attributes, attribute_index, vtable)
+            self.layouts[name] = layout
+        return layout
+
     def all_attributes(self, name):
+        # The returned list is shared with the cache and must not be modified
         if name is None:
             return []
+        return self.layout(name)[0]
+
+    def get_attribute_index(self, class_name, attribute_name):
+        # Index of the attribute in the object, or -1 if it is not found
+        return self.layout(class_name)[1].get(attribute_name, -1)
+
+    def build_all_attributes(self, name):
         alist = self.all_attributes(self.get_parent(name))
         overrides = {a[0][1]: True for a in self.data[name]['attribs']}
         # Remove overridden attributes
@@ -90,6 +161,7 @@ class ClassTable:
             print(f"Error: Class {cname} not defined.")
             exit()
         self.data[cname]['methods'].append((mname, args, type_, body, cname))
+        self.invalidate_layouts()
 
     def get_method(self, cname, mname):
         for m in self.data[cname]['methods']:
@@ -105,16 +177,15 @@ class ClassTable:
             return m
         return self.find_method(self.get_parent(cname), mname)
 
+    def vtable(self, name):
+        return self.layout(name)[2]
+
     def all_methods(self, name):
+        # Methods in vtable order. The returned list is shared with the
+        # cache and must not be modified.
         if name is None:
             return []
-        mlist = self.all_methods(self.get_parent(name))
-        overrides = {m[0]: True for m in self.data[name]['methods']}
-        # Remove overridden methods
-        mlist = [m for m in mlist if m[0] not in overrides]
-        # Add current class's methods
-        mlist += self.data[name]['methods']
-        return mlist
+        return self.vtable(name).methods
 
     def declared_methods(self, name):
         return self.data[name]['methods']
@@ -133,15 +204,7 @@ class ClassTable:
         Returns:
             int: The index of the method in the vtable, or -1 if the method is not found.
         """
-        # Retrieve all methods in vtable order
-        methods = self.all_methods(class_name)
-        # Find the index of the method
-        for index, method in enumerate(methods):
-            if method[0] == method_name:  # Compare method names
-                return index
-
-        # Method not found
-        return -1
+        return self.vtable(class_name).index(method_name)
     
 
     
\ No newline at end of file
@@ -4,8 +4,11 @@ from helpers import LabelGenerator, StringCache
 from errors import RuntimeErrorHandler
 
 class CodeGenerator:
-    def __init__(self, class_table, ast, symbol_table, filename):
+    def __init__(self, class_table, ast, symbol_table, filename, reachability=None):
         self.ctab = class_table
+        # With a Reachability, only live classes get a constructor and a
+        # vtable, and only reachable methods get a body
+        self.reachability = reachability
         self.ast = ast
         self.stab = symbol_table
         self.filename = filename
@@ -17,6 +20,7 @@ class CodeGenerator:
         self.current_class = None
         self.current_method = None
         self.reverse_class_name_mapping = {}
+        self.expression_handlers = self.build_expression_handlers()
 
     def close(self):
         self.f.close()
@@ -97,22 +101,33 @@ class CodeGenerator:
             obj_id += 1
 
 
+    def emitted_classes(self):
+        # Classes that get a constructor and a vtable
+        classes = sorted(self.ctab.all_classes())
+        if self.reachability is None:
+            return classes
+        return [cname for cname in classes if self.reachability.is_live(cname)]
+
     def define_vtables(self):
         self.asm_2("# VTables")
-        for cname in sorted(self.ctab.all_classes()):
+        for cname in self.emitted_classes():
             vtable_label = f"{cname}..vtable"
             self.asm_2(f".globl {vtable_label}")
             self.asm(f"{vtable_label}:", f"# VTable for {cname}")
             constructor_label = f"{cname}..new"
             self.asm(f"    .quad {constructor_label}", f"# Constructor for {cname}")
-            methods = self.ctab.all_methods(cname)
-            for method in methods:
-                method_label = f"{method[4]}.{method[0]}"
+            vtable = self.ctab.vtable(cname)
+            for method in vtable.methods:
+                if self.reachability is not None and not self.reachability.is_reached(method[4], method[0]):
+                    # The slot stays, so every method keeps its offset
+                    self.asm("    .quad 0", f"# Method {method[0]} for {cname} (unreachable)")
+                    continue
+                method_label = vtable.label(method[0])
                 self.asm(f"    .quad {method_label}", f"# Method {method[0]} for {cname}")
 
     def generate_constructors(self):
         self.asm("# Constructors", "")
-        for cname in sorted(self.ctab.all_classes()):
+        for cname in self.emitted_classes():
             obj_id = self.reverse_class_name_mapping[cname]
             constructor_label = f"{cname}..new"
             self.asm_2(f".globl {constructor_label}")
@@ -177,6 +192,8 @@ class CodeGenerator:
             methods = self.ctab.declared_methods(cname)
             for method in methods:
                 mname, args, mtype, body, defining_class = method
+                if self.reachability is not None and not self.reachability.is_reached(defining_class, mname):
+                    continue
                 method_label = f"{defining_class}.{mname}"
                 self.asm_2(f".globl {method_label}")
                 self.asm(f"{method_label}:", f"# Method {mname} of {defining_class}")
@@ -236,67 +253,61 @@ class CodeGenerator:
         self.asm("    call exit", "# Exit the program")
 
 
+    def build_expression_handlers(self):
+        # Expression tag -> bound handler. Every handler takes (expr, tag,
+        # line_number, target_reg), so generate_expression does a single
+        # lookup and a single call per node.
+        handlers = {
+            'assign': self.generate_assign,
+            'static_dispatch': self.generate_static_dispatch,
+            'dynamic_dispatch': self.generate_dynamic_dispatch,
+            'self_dispatch': self.generate_self_dispatch,
+            'if': self.generate_if,
+            'block': self.generate_block,
+            'while': self.generate_while,
+            'let': self.generate_let,
+            'case': self.generate_case,
+            'new': self.generate_new,
+            'isvoid': self.generate_isvoid,
+            'negate': self.generate_negate,
+            'not': self.generate_not,
+            'internal': self.generate_internal,
+            'integer': self.generate_integer,
+            'string': self.generate_string,
+            'true': self.generate_true,
+            'false': self.generate_false,
+            'identifier': self.generate_identifier,
+        }
+        for tag in ['plus', 'minus', 'times', 'divide']:
+            handlers[tag] = self.generate_arithmetic
+        for tag in ['lt', 'le', 'eq']:
+            handlers[tag] = self.generate_comparison
+        return handlers
+
     def generate_expression(self, expr, target_reg='%rax'):
         # Recursively generate code for an expression.
-        expr_type = expr[1]
         tag = expr[2]
         line_number = int(expr[0])
 
-        if tag == 'assign':
-            var_name = expr[3][1]
-            rhs = expr[4]
-            self.generate_expression(rhs, target_reg='%rax')
-            var_address = self.stab.find_symbol(var_name)
-            if var_address is None:
-                print(f"Error: Variable '{var_name}' not found at line {line_number}.")
-                exit()
-            self.asm(f"    movq %rax, {var_address}", f"# Assign to variable '{var_name}'")
-            self.asm(f"    movq %rax, {target_reg}", f"# Result of assignment to '{var_name}'")
-        elif tag == 'static_dispatch':
-            self.generate_static_dispatch(expr, line_number, target_reg)
-        elif tag == 'dynamic_dispatch':
-            self.generate_dynamic_dispatch(expr, line_number, target_reg)
-        elif tag == 'self_dispatch':
-            self.generate_self_dispatch(expr, line_number, target_reg)
-        elif tag == 'if':
-            self.generate_if(expr, line_number, target_reg)
-        elif tag == 'block':
-            self.generate_block(expr, line_number, target_reg)
-        elif tag == 'while':
-            self.generate_while(expr, line_number, target_reg)
-        elif tag == 'let':
-            self.generate_let(expr, line_number, target_reg)
-        elif tag == 'case':
-            self.generate_case(expr, line_number, target_reg)
-        elif tag == 'new':
-            self.generate_new(expr, target_reg)
-        elif tag == 'isvoid':
-            self.generate_isvoid(expr, target_reg)
-        elif tag == 'negate':
-            self.generate_negate(expr, target_reg)
-        elif tag == 'not':
-            self.generate_not(expr, target_reg)
-        elif tag in ['plus', 'minus', 'times', 'divide']:
-            self.generate_arithmetic(expr, tag, line_number, target_reg)
-        elif tag in ['lt', 'le', 'eq']:
-            self.generate_comparison(expr, tag, line_number, target_reg)
-        elif tag == 'internal':
-            self.generate_internal(expr, target_reg)
-        elif tag == 'integer':
-            self.generate_integer(expr, target_reg)
-        elif tag == 'string':
-            self.generate_string(expr, target_reg)
-        elif tag == 'true':
-            self.generate_true(expr, target_reg)
-        elif tag == 'false':
-            self.generate_false(expr, target_reg)
-        elif tag == 'identifier':
-            self.generate_identifier(expr, target_reg)
-        else:
+        handler = self.expression_handlers.get(tag)
+        if handler is None:
             print(f"ERROR: Unhandled expression tag '{tag}' at line {line_number}.")
             exit()
+        handler(expr, tag, line_number, target_reg)
 
-    def generate_static_dispatch(self, expr, line_number, target_reg='%rax'):
+    def generate_assign(self, expr, tag, line_number, target_reg='%rax'):
+        # Generate code for assignment.
+        var_name = expr[3][1]
+        rhs = expr[4]
+        self.generate_expression(rhs, target_reg='%rax')
+        var_address = self.stab.find_symbol(var_name)
+        if var_address is None:
+            print(f"Error: Variable '{var_name}' not found at line {line_number}.")
+            exit()
+        self.asm(f"    movq %rax, {var_address}", f"# Assign to variable '{var_name}'")
+        self.asm(f"    movq %rax, {target_reg}", f"# Result of assignment to '{var_name}'")
+
+    def generate_static_dispatch(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for static dispatch.
         dispatch_exp = expr[3]
         dispatch_type = expr[4][1]
@@ -318,12 +329,11 @@ class CodeGenerator:
         # Load vtable pointer (offset +16 in object layout)
         self.asm("    movq 16(%rax), %rsi", "# Load vtable pointer into %rsi")
 
-        # Calculate method offset in vtable
-        method_index = self.ctab.get_method_index(dispatch_type, method_name)
-        if method_index == -1:
+        # Calculate method offset in vtable (new is the first entry)
+        offset = self.ctab.vtable(dispatch_type).offset(method_name)
+        if offset is None:
             print(f"Error: Method '{method_name}' not found in class '{dispatch_type}' at line {line_number}.")
             exit(1)
-        offset = (method_index + 1) * 8  # New is the first entry in vtable
 
         # Load method address into %rdx (caller-saved register)
         self.asm(f"    movq {offset}(%rsi), %rdx", f"# Load address of method '{method_name}' from vtable into %rdx")
@@ -355,7 +365,7 @@ class CodeGenerator:
 
 
 
-    def generate_dynamic_dispatch(self, expr, line_number, target_reg='%rax'):
+    def generate_dynamic_dispatch(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for dynamic dispatch.
         dispatch_exp = expr[3]
         static_type = expr[3][1]
@@ -377,14 +387,11 @@ class CodeGenerator:
         # Load vtable pointer (offset +16 in object layout)
         self.asm("    movq 16(%rax), %rsi", "# Load vtable pointer into %rsi")
 
-        # Get method index using static type
-        method_index = self.ctab.get_method_index(static_type, method_name)
-        if method_index == -1:
+        # Get method offset in vtable using static type
+        offset = self.ctab.vtable(static_type).offset(method_name)
+        if offset is None:
             print(f"Error: Method '{method_name}' not found in class '{static_type}' at line {line_number}.")
             exit(1)
-
-        # Calculate method offset in vtable
-        offset = (method_index + 1) * 8
         # Load method address into %rdx
         self.asm(f"    movq {offset}(%rsi), %rdx", f"# Load address of method '{method_name}' from vtable into %rdx")
 
@@ -415,7 +422,7 @@ class CodeGenerator:
 
 
 
-    def generate_self_dispatch(self, expr, line_number, target_reg='%rax'):
+    def generate_self_dispatch(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for self dispatch.
         method_name = expr[5][1]
         args = expr[6]
@@ -425,13 +432,11 @@ class CodeGenerator:
         self.asm("    movq 16(%rbx), %rsi", "# Load vtable pointer of 'self' into %rsi")
 
         # Calculate method offset in vtable
-        method_index = self.ctab.get_method_index(self.current_class, method_name)
-        if method_index == -1:
+        # The first function of the vtable is the new method which is not in ctab
+        offset = self.ctab.vtable(self.current_class).offset(method_name)
+        if offset is None:
             print(f"Error: Method '{method_name}' not found in class '{self.current_class}' at line {line_number}.")
             exit(1)
-
-        # The first function of the vtable is the new method which is not in ctab
-        offset = (method_index + 1) * 8
         # Load method address into %rdx
         self.asm(f"    movq {offset}(%rsi), %rdx", f"# Load address of method '{method_name}' from vtable into %rdx")
 
@@ -461,7 +466,7 @@ class CodeGenerator:
 
 
 
-    def generate_if(self, expr, line_number, target_reg='%rax'):
+    def generate_if(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for if-then-else expressions.
         cond = expr[3]
         then_exp = expr[4]
@@ -487,13 +492,13 @@ class CodeGenerator:
         # End
         self.asm(f"{label_end}:")
 
-    def generate_block(self, expr, line_number, target_reg='%rax'):
+    def generate_block(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for block expressions.
         expressions = expr[3]
         for sub_expr in expressions:
             self.generate_expression(sub_expr, target_reg='%rax')
 
-    def generate_while(self, expr, line_number, target_reg='%rax'):
+    def generate_while(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for while loops.
         cond = expr[3]
         body = expr[4]
@@ -520,7 +525,7 @@ class CodeGenerator:
         self.asm(f"{label_end}:", "# End of while loop")
 
 
-    def generate_let(self, expr, line_number, target_reg='%rax'):
+    def generate_let(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for let expressions.
         bindings = expr[3]
         body = expr[4]
@@ -586,7 +591,7 @@ class CodeGenerator:
         # Exit scope
         self.stab.exit_scope()
 
-    def generate_case(self, expr, line_number, target_reg='%rax'):
+    def generate_case(self, expr, tag, line_number, target_reg='%rax'):
         # Extract case elements
         case_expr = expr[3]       # Expression being matched
         case_elements = expr[4]   # List of (var, type_, body) tuples
@@ -655,14 +660,14 @@ class CodeGenerator:
 
 
 
-    def generate_new(self, expr, target_reg='%rax'):
+    def generate_new(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for object creation using 'new'.
         class_name = expr[3][1]
         constructor_label = f"{class_name}..new"
         self.asm(f"    call {constructor_label}", f"# Create new {class_name} object")
         self.asm(f"    movq %rax, {target_reg}", f"# Move new object to {target_reg}")
 
-    def generate_isvoid(self, expr, target_reg='%rax'):
+    def generate_isvoid(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for isvoid expressions.
         exp = expr[3]
         self.generate_expression(exp, target_reg='%rax')
@@ -691,7 +696,7 @@ class CodeGenerator:
         self.asm("    movb %cl, 24(%rax)", "# Set Bool value (attribute at offset 24)")
         self.asm(f"    movq %rax, {target_reg}", f"# Move Bool object to {target_reg}")
 
-    def generate_negate(self, expr, target_reg='%rax'):
+    def generate_negate(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for negate expressions (applies to integers).
         exp = expr[3]
         self.generate_expression(exp, target_reg='%rax')
@@ -713,7 +718,7 @@ class CodeGenerator:
 
 
 
-    def generate_not(self, expr, target_reg='%rax'):
+    def generate_not(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for 'not' expressions (applies to booleans).
         exp = expr[3]
         self.generate_expression(exp, target_reg='%rax')
@@ -816,7 +821,7 @@ class CodeGenerator:
 
 
 
-    def generate_internal(self, expr, target_reg):
+    def generate_internal(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for internal methods like IO.out_string, IO.out_int, etc.
         internal_method = expr[3]
         if internal_method == 'IO.out_int':
@@ -1105,7 +1110,7 @@ class CodeGenerator:
 
 
 
-    def generate_integer(self, expr, target_reg='%rax'):
+    def generate_integer(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for integer literals.
         value = expr[3]  # Extract the integer value from the expression
 
@@ -1130,7 +1135,7 @@ class CodeGenerator:
         # Move the address of the Int object to the target register
         self.asm(f"    movq %rax, {target_reg}", f"# Move Int object to {target_reg}")
 
-    def generate_string(self, expr, target_reg='%rax'):
+    def generate_string(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for string literals.
         string_value = expr[3]
         string_label = self.string_cache.cache_string(string_value)
@@ -1155,7 +1160,7 @@ class CodeGenerator:
         self.asm(f"    movq %rax, {target_reg}", f"# Move String object to {target_reg}")
 
 
-    def generate_true(self, expr, target_reg='%rax'):
+    def generate_true(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for 'true' boolean literal.
         self.asm("    movb $1, %cl", "# Set %cl to 1 for true")
 
@@ -1171,7 +1176,7 @@ class CodeGenerator:
         self.asm(f"    movq %rax, {target_reg}", f"# Move Bool object to {target_reg}")
 
 
-    def generate_false(self, expr, target_reg='%rax'):
+    def generate_false(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for 'false' boolean literal.
         self.asm("    movb $0, %cl", "# Set %cl to 0 for false")
 
@@ -1186,7 +1191,7 @@ class CodeGenerator:
         self.asm("    movb %cl, 24(%rax)", "# Set Bool value to false (attribute at offset 24)")
         self.asm(f"    movq %rax, {target_reg}", f"# Move Bool object to {target_reg}")
 
-    def generate_identifier(self, expr, target_reg='%rax'):
+    def generate_identifier(self, expr, tag, line_number, target_reg='%rax'):
         # Generate code for variable identifiers.
         var_name = expr[3][1]
         if var_name == 'self':
@@ -4,10 +4,13 @@ import sys
 from ast_parser import ASTParser
 from symbol_table import SymbolTable
 from code_generator import CodeGenerator
+from reachability import Reachability
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python3 main.py <file.cl-type>")
+    # --eliminate-dead-code leaves out the classes and methods that
+    # Main.main can never reach
+    if len(sys.argv) not in [2, 3] or (len(sys.argv) == 3 and sys.argv[2] != '--eliminate-dead-code'):
+        print("Usage: python3 main.py <file.cl-type> [--eliminate-dead-code]")
         sys.exit(1)
 
     filename = sys.argv[1]
@@ -21,8 +24,12 @@ def main():
 
     # print()
 
+    reachability = None
+    if len(sys.argv) == 3:
+        reachability = Reachability(ctab).analyze()
+
     # Initialize code generator
-    generator = CodeGenerator(ctab, ast, stab, filename)
+    generator = CodeGenerator(ctab, ast, stab, filename, reachability)
     generator.generate()
 
     print("Assembly generation completed successfully.")
@@ -0,0 +1,126 @@
+# reachability.py
+
+# Classes whose vtables the generated code refers to directly, to box
+# literals and the results of arithmetic, comparisons and built-in methods
+BOXED_CLASSES = ['Int', 'Bool', 'String']
+
+class Reachability:
+    # Whole-program reachability, from Main..new and Main.main (rapid type
+    # analysis). A class is live once some reachable code can construct it:
+    # through new, through a let without an initializer (which calls the
+    # constructor), or as one of the boxed classes. A method is reachable
+    # once a dispatch on a static type T can land on it, that is, once it is
+    # the implementation of the dispatched name in a live class that
+    # conforms to T. Static dispatch counts as a dispatch on its type, since
+    # the generated code also goes through the vtable of the object.
+    #
+    # Constructors and attribute initializers of live classes and bodies of
+    # reachable methods are scanned once each. A class that becomes live
+    # later also gets the names already dispatched on its ancestors.
+    def __init__(self, class_table):
+        self.ctab = class_table
+        self.live_classes = set()
+        # (defining class, method name) of every reachable method
+        self.reached_methods = set()
+        # Static type -> method names dispatched on it
+        self.dispatched = {}
+        # Class -> live classes that conform to it
+        self.live_subclasses = {}
+        # (expression, class of self) still to scan
+        self.pending = []
+
+    def analyze(self):
+        for cname in BOXED_CLASSES + ['Main']:
+            self.make_live(cname)
+        if 'Main' in self.ctab.data:
+            self.reach('Main', 'main')
+        while self.pending:
+            expr, cname = self.pending.pop()
+            self.scan(expr, cname)
+        return self
+
+    def is_live(self, cname):
+        return cname in self.live_classes
+
+    def is_reached(self, cname, mname):
+        return (cname, mname) in self.reached_methods
+
+    def make_live(self, cname):
+        if cname in self.live_classes or cname not in self.ctab.data:
+            return
+        self.live_classes.add(cname)
+        ancestor = cname
+        while ancestor is not None:
+            self.live_subclasses.setdefault(ancestor, []).append(cname)
+            for mname in self.dispatched.get(ancestor, ()):
+                self.reach(cname, mname)
+            ancestor = self.ctab.get_parent(ancestor)
+        # The constructor evaluates every initializer, inherited ones included
+        for (aname, atype, init) in self.ctab.all_attributes(cname):
+            if init is not None:
+                self.pending.append((init, cname))
+
+    def dispatch(self, static_type, mname):
+        names = self.dispatched.setdefault(static_type, set())
+        if mname in names:
+            return
+        names.add(mname)
+        for cname in self.live_subclasses.get(static_type, ()):
+            self.reach(cname, mname)
+
+    def reach(self, cname, mname):
+        # The implementation of mname that an object of class cname runs
+        vtable = self.ctab.vtable(cname)
+        if vtable.index(mname) < 0:
+            return
+        method = vtable.methods[vtable.index(mname)]
+        key = (method[4], mname)
+        if key not in self.reached_methods:
+            self.reached_methods.add(key)
+            self.pending.append((method[3], method[4]))
+
+    def scan(self, expr, cname):
+        # cname is the class of self: the class that defines the method, or
+        # the class being constructed
+        stack = [expr]
+        while stack:
+            e = stack.pop()
+            if e is None:
+                continue
+            tag = e[2]
+            if tag == 'new':
+                # new SELF_TYPE makes an object of a class that is already live
+                if e[3][1] != 'SELF_TYPE':
+                    self.make_live(e[3][1])
+            elif tag == 'let':
+                for (bind, var, type_, init) in e[3]:
+                    if init is not None:
+                        stack.append(init)
+                    elif type_[1] not in BOXED_CLASSES and type_[1] != 'SELF_TYPE':
+                        self.make_live(type_[1])
+                stack.append(e[4])
+            elif tag == 'static_dispatch':
+                self.dispatch(e[4][1], e[5][1])
+                stack.append(e[3])
+                stack.extend(e[6])
+            elif tag == 'dynamic_dispatch':
+                static_type = e[3][1]
+                self.dispatch(cname if static_type == 'SELF_TYPE' else static_type, e[5][1])
+                stack.append(e[3])
+                stack.extend(e[6])
+            elif tag == 'self_dispatch':
+                self.dispatch(cname, e[5][1])
+                stack.extend(e[6])
+            elif tag == 'case':
+                stack.append(e[3])
+                stack.extend(element[2] for element in e[4])
+            elif tag == 'block':
+                stack.extend(e[3])
+            elif tag == 'assign':
+                stack.append(e[4])
+            elif tag == 'if':
+                stack.extend(e[3:6])
+            elif tag in ['while', 'plus', 'minus', 'times', 'divide', 'lt', 'le', 'eq']:
+                stack.extend(e[3:5])
+            elif tag in ['negate', 'not', 'isvoid']:
+                stack.append(e[3])
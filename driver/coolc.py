@@ -0,0 +1,303 @@
+# coolc.py
+
+import asyncio
+import hashlib
+import importlib
+import io
+import json
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+
+# Whole-pipeline driver: lexer, parser, semantic analyzer and code generator
+# in one process.
+#
+#   python3 coolc.py <file.cl> [--check-only] [--engine ply|rd]
+#   python3 coolc.py --server [--socket coolc.sock] [--cache types.sqlite]
+#   python3 coolc.py --connect coolc.sock <file.cl> [--check-only] [--engine ply|rd] [--repeat 1]
+#
+# The stages still communicate through the .cl-lex, .cl-ast and .cl-type
+# files, written to a scratch directory, so a compile prints and writes
+# exactly what running the four main.py scripts one after another does.
+# What the driver saves is the startup: the interpreter, the imports and the
+# PLY lexer and LALR tables are loaded once, and a server keeps them for
+# every request.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SOCKET = "coolc.sock"
+
+@contextmanager
+def stage_imports(directory):
+    # The stages import their siblings by bare name and share some names
+    # (main, class_table, symbol_table), so each stage is imported with only
+    # its own directory on the path. Its modules are then dropped from
+    # sys.modules; the objects built here keep their own references.
+    path = os.path.join(ROOT, directory)
+    before = set(sys.modules)
+    sys.path.insert(0, path)
+    try:
+        yield
+    finally:
+        sys.path.remove(path)
+        for name in set(sys.modules) - before:
+            filename = getattr(sys.modules[name], '__file__', None)
+            if filename and os.path.dirname(os.path.abspath(filename)) == path:
+                del sys.modules[name]
+
+def exit_status(code):
+    # Same as the interpreter does for SystemExit
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code)
+    return 1
+
+class Compiler:
+    def __init__(self, cache=None):
+        # Type check results are kept in this SQLite file, if given
+        self.cache = cache
+        # Last result for each path, returned again while the source and
+        # options do not change
+        self.results = {}
+
+        with stage_imports('lexer'):
+            self.lexer_main = importlib.import_module('main')
+            # Built once, as lexer/main.py does when run from its directory
+            self.lexer = self.lexer_main.CoolLexer(outputDir=os.path.join(ROOT, 'lexer'))
+        with stage_imports('parser'):
+            self.parser_main = importlib.import_module('main')
+            self.lexer_cl = importlib.import_module('lexer_cl')
+            # yacc reads parsetab.py from the parser directory once
+            self.ply_parser = self.parser_main.CoolParser(self.lexer_cl.DummyLexer.from_tokens([]))
+        with stage_imports('semantic analyzer'):
+            self.semantic_main = importlib.import_module('main')
+        with stage_imports('code generator'):
+            self.generator_main = importlib.import_module('main')
+
+    def lex(self, source, lex_filename):
+        # lexer/main.py with a lexer that is already built
+        lexer = self.lexer
+        lexer.comment_lcount = 0
+        lexer.lastToken = None
+        lexer.lexer.lexstatestack = []
+        lexer.lexer.begin('INITIAL')
+        lexer.lexer.lineno = 1
+        lexer.input(source)
+        with open(lex_filename, "w") as out:
+            for token in lexer:
+                out.write("%d\n" % token.lineno)
+                out.write("%s\n" % token.type)
+                if token.type in ['identifier', 'integer', 'string', 'type']:
+                    out.write("%s\n" % token.value)
+            if lexer.comment_lcount > 0:
+                print(f"ERROR: {lexer.lexer.lineno}: Lexer: unterminated comment")
+                sys.exit(1)
+
+    def parse(self, lex_filename, engine):
+        # parser/main.py; the ply engine reuses the parser built by yacc
+        lexer = self.lexer_cl.DummyLexer(lex_filename)
+        if engine == 'ply':
+            parser = self.ply_parser
+            parser.lexer = lexer
+        else:
+            parser = self.parser_main.make_parser(engine, lexer)
+        ast = parser.parse()
+        self.parser_main.OutputAST(ast, lex_filename[:-3] + "ast").output_ast_file()
+
+    def run_main(self, module, args):
+        # A stage's own main(), as if started with these arguments
+        saved = sys.argv
+        sys.argv = ['main.py'] + args
+        try:
+            module.main()
+        finally:
+            sys.argv = saved
+
+    def compile(self, request):
+        # request: {"source": text, "path": name, "check_only": bool,
+        # "engine": "ply" | "rd"}. Returns the output of the stages, the exit
+        # status of the last stage that ran and the assembly, if any.
+        source = request['source']
+        check_only = bool(request.get('check_only', False))
+        engine = request.get('engine', 'ply')
+        path = request.get('path')
+        fingerprint = hashlib.sha256(json.dumps([source, check_only, engine]).encode()).hexdigest()
+        if path is not None and path in self.results and self.results[path][0] == fingerprint:
+            return dict(self.results[path][1], cached=True)
+
+        start = time.perf_counter()
+        directory = tempfile.mkdtemp(prefix='coolc_')
+        filename = os.path.join(directory, 'program.cl')
+        output = io.StringIO()
+        stage = None
+        status = 0
+        assembly = None
+        try:
+            with redirect_stdout(output), redirect_stderr(output):
+                try:
+                    stage = 'lexer'
+                    self.lex(source, filename + "-lex")
+                    stage = 'parser'
+                    self.parse(filename + "-lex", engine)
+                    stage = 'semantic analyzer'
+                    options = ['--check-only'] if check_only else []
+                    if self.cache:
+                        options += ['--cache', self.cache]
+                    self.run_main(self.semantic_main, [filename + "-ast"] + options)
+                    if not check_only:
+                        stage = 'code generator'
+                        self.run_main(self.generator_main, [filename + "-type"])
+                except SystemExit as e:
+                    status = exit_status(e.code)
+                except Exception as e:
+                    print(f"ERROR: {e}")
+                    status = 1
+            if stage == 'code generator' and status == 0:
+                # Named the way the code generator names it
+                assembly_filename = f"{(filename + '-type').split('.')[0]}.s"
+                if os.path.exists(assembly_filename):
+                    with open(assembly_filename) as f:
+                        assembly = f.read()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        result = {
+            'status': status,
+            'stage': stage,
+            'output': output.getvalue(),
+            'assembly': assembly,
+            'time': time.perf_counter() - start
+        }
+        if path is not None:
+            self.results[path] = (fingerprint, result)
+        return dict(result, cached=False)
+
+async def serve(compiler, socket_path):
+    # One JSON request per line, one JSON response per line. Connections are
+    # served concurrently; compiles run one at a time on a worker thread,
+    # since the stages print to the process-wide stdout and hold the GIL.
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict) or not isinstance(request.get('source'), str):
+                        raise ValueError("request must be an object with a source string")
+                except ValueError as e:
+                    response = {'error': str(e)}
+                else:
+                    response = await loop.run_in_executor(executor, compiler.compile, request)
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        finally:
+            writer.close()
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = await asyncio.start_unix_server(handle, path=socket_path)
+    # Runs until SIGINT or SIGTERM, then removes the socket
+    stop = loop.create_future()
+    for signum in [signal.SIGINT, signal.SIGTERM]:
+        loop.add_signal_handler(signum, lambda: stop.done() or stop.set_result(None))
+    print(f"coolc: listening on {socket_path}", flush=True)
+    try:
+        async with server:
+            await stop
+    finally:
+        executor.shutdown()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+def request_for(filename, options):
+    with open(filename, encoding="utf-8") as f:
+        source = f.read()
+    return {
+        'source': source,
+        'path': os.path.abspath(filename),
+        'check_only': 'check-only' in options,
+        'engine': options.get('engine', 'ply')
+    }
+
+def report(filename, result):
+    # Prints what the stages printed and writes the assembly next to the
+    # source, as the separate stages would
+    sys.stdout.write(result['output'])
+    if result['assembly'] is not None:
+        with open(os.path.splitext(filename)[0] + ".s", "w") as f:
+            f.write(result['assembly'])
+    return result['status']
+
+def connect(socket_path, filename, request, options):
+    repeat = int(options.get('repeat', 1))
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(socket_path)
+    responses = client.makefile('rb')
+    start = time.perf_counter()
+    for _ in range(repeat):
+        client.sendall((json.dumps(request) + "\n").encode())
+        result = json.loads(responses.readline())
+    elapsed = time.perf_counter() - start
+    client.close()
+    if 'error' in result:
+        print(f"ERROR: {result['error']}")
+        return 1
+    if repeat > 1:
+        print(f"{repeat} requests, {1000 * elapsed / repeat:.2f} ms per round trip", file=sys.stderr)
+    return report(filename, result)
+
+def parse_options(args):
+    # Returns (filename, options). --server and --check-only are flags, the
+    # other options are given as "--name value".
+    filename = None
+    options = {}
+    i = 0
+    while i < len(args):
+        if args[i] in ['--server', '--check-only']:
+            options[args[i][2:]] = True
+            i += 1
+        elif args[i].startswith('--'):
+            if i + 1 >= len(args):
+                print(f"ERROR: Missing value for option {args[i]}")
+                sys.exit(1)
+            options[args[i][2:]] = args[i + 1]
+            i += 2
+        else:
+            filename = args[i]
+            i += 1
+    return filename, options
+
+def main():
+    filename, options = parse_options(sys.argv[1:])
+    if 'server' in options:
+        compiler = Compiler(options.get('cache'))
+        asyncio.run(serve(compiler, options.get('socket', DEFAULT_SOCKET)))
+        return
+
+    if filename is None or not filename.endswith('.cl'):
+        print("Usage: python3 coolc.py <file.cl> [--check-only] [--engine ply|rd] [--connect <socket>] [--repeat 1]")
+        print("       python3 coolc.py --server [--socket coolc.sock] [--cache <types.sqlite>]")
+        sys.exit(1)
+    try:
+        request = request_for(filename, options)
+    except IOError:
+        print(f"ERROR: Could not open file {filename}")
+        sys.exit(1)
+    if 'connect' in options:
+        sys.exit(connect(options['connect'], filename, request, options))
+    sys.exit(report(filename, Compiler(options.get('cache')).compile(request)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import io
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+from lexer_cl import DummyLexer
+from main import CoolParser, make_parser
+
+# Differential harness and throughput benchmark for the two parser engines.
+#
+#   python3 compare_engines.py good.cl-lex [more.cl-lex ...]
+#       [--mutations 200] [--scale 50] [--repeat 5] [--seed 0]
+#
+# Every input is parsed by both engines and the AST tuples are compared.
+# Each input is then mutated (tokens dropped, duplicated, swapped or
+# replaced) and the engines must print the same error message. Finally the
+# token stream is replicated --scale times and both engines are timed.
+
+class EngineRunner:
+    def __init__(self, engine):
+        self.engine = engine
+        # The yacc tables are built once and reused for every run
+        self.parser = make_parser(engine, DummyLexer.from_tokens([]))
+
+    def run(self, tokens):
+        self.parser.lexer = DummyLexer.from_tokens(tokens)
+        output = io.StringIO()
+        try:
+            with redirect_stdout(output):
+                ast = self.parser.parse()
+        except SystemExit:
+            return ('error', output.getvalue())
+        return ('ok', ast)
+
+    def time_parse(self, tokens, repeat):
+        best = None
+        for _ in range(repeat):
+            self.parser.lexer = DummyLexer.from_tokens(tokens)
+            start = time.perf_counter()
+            self.parser.parse()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return best
+
+def mutate(tokens, rng):
+    tokens = list(tokens)
+    if not tokens:
+        return tokens
+    i = rng.randrange(len(tokens))
+    choice = rng.randrange(4)
+    if choice == 0:
+        del tokens[i]
+    elif choice == 1:
+        tokens.insert(i, tokens[i])
+    elif choice == 2 and i + 1 < len(tokens):
+        tokens[i], tokens[i + 1] = tokens[i + 1], tokens[i]
+    else:
+        token_type = rng.choice(CoolParser.tokens)
+        tokens[i] = (tokens[i][0], token_type, tokens[i][2] if token_type in ['IDENTIFIER', 'INTEGER', 'TYPE', 'STRING'] else token_type.lower())
+    return tokens
+
+def replicate(tokens, scale):
+    # Repeats the program, shifting line numbers so that every copy is distinct
+    if not tokens:
+        return tokens
+    lines = max(int(token[0]) for token in tokens)
+    result = []
+    for copy in range(scale):
+        offset = copy * lines
+        result.extend((str(int(line) + offset), token_type, lexeme) for (line, token_type, lexeme) in tokens)
+    return result
+
+def main():
+    filenames = []
+    options = {}
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        if args[i].startswith('--') and i + 1 < len(args):
+            options[args[i][2:]] = args[i + 1]
+            i += 2
+        else:
+            filenames.append(args[i])
+            i += 1
+    if not filenames:
+        print("Usage: python3 compare_engines.py <tokens_filename> ... [--mutations N] [--scale N] [--repeat N] [--seed N]")
+        sys.exit(1)
+
+    mutations = int(options.get('mutations', 200))
+    scale = int(options.get('scale', 50))
+    repeat = int(options.get('repeat', 5))
+    rng = random.Random(int(options.get('seed', 0)))
+
+    ply_runner = EngineRunner('ply')
+    rd_runner = EngineRunner('rd')
+    mismatches = 0
+
+    for filename in filenames:
+        tokens = DummyLexer(filename).tokens
+        original = ply_runner.run(tokens)
+        if rd_runner.run(tokens) != original:
+            print(f"{filename}: engines disagree on the original input")
+            mismatches += 1
+
+        for _ in range(mutations):
+            mutated = mutate(tokens, rng)
+            expected = ply_runner.run(mutated)
+            actual = rd_runner.run(mutated)
+            if actual != expected:
+                mismatches += 1
+                print(f"{filename}: engines disagree on a mutated input")
+                print("  ply:", expected[1] if expected[0] == 'error' else 'parsed')
+                print("  rd: ", actual[1] if actual[0] == 'error' else 'parsed')
+
+        if original[0] == 'error':
+            # Inputs with syntax errors cannot be benchmarked
+            continue
+        big = replicate(tokens, scale)
+        ply_time = ply_runner.time_parse(big, repeat)
+        rd_time = rd_runner.time_parse(big, repeat)
+        print(f"{filename}: {len(big)} tokens, "
+              f"ply {len(big) / ply_time:,.0f} tokens/s, "
+              f"rd {len(big) / rd_time:,.0f} tokens/s, "
+              f"speedup {ply_time / rd_time:.2f}x")
+
+    if mismatches:
+        print(f"{mismatches} mismatches")
+        sys.exit(1)
+    print("engines agree")
+
+if __name__ == "__main__":
+    main()
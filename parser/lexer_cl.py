@@ -4,8 +4,17 @@ import sys
 class DummyLexer:
     def __init__(self, tokens_filename):
         self.tokens = []
+        self.position = 0
         self._read_tokens(tokens_filename)
 
+    @classmethod
+    def from_tokens(cls, tokens):
+        # Builds a lexer over an in-memory list of (line, type, lexeme) tuples
+        lexer = cls.__new__(cls)
+        lexer.tokens = tokens
+        lexer.position = 0
+        return lexer
+
     def _read_tokens(self, tokens_filename):
         try:
             with open(tokens_filename, 'r') as f:
@@ -14,8 +23,8 @@ class DummyLexer:
             print(f"ERROR: File '{tokens_filename}' not found.")
             sys.exit(1)
 
-        while tokens_lines:
-            line_number = self._get_token_line(tokens_lines)
+        tokens_lines = iter(tokens_lines)
+        for line_number in tokens_lines:
             token_type = self._get_token_line(tokens_lines)
             if token_type in ['identifier', 'integer', 'type', 'string']:
                 token_lexeme = self._get_token_line(tokens_lines)
@@ -24,15 +33,50 @@ class DummyLexer:
             self.tokens.append((line_number, token_type.upper(), token_lexeme))
 
     def _get_token_line(self, tokens_lines):
-        return tokens_lines.pop(0) if tokens_lines else ''
+        return next(tokens_lines, '')
 
     def token(self):
-        if not self.tokens:
+        if self.position >= len(self.tokens):
             return None
-        line, token_type, lexeme = self.tokens.pop(0)
+        line, token_type, lexeme = self.tokens[self.position]
+        self.position += 1
         tok = lex.LexToken()
         tok.type = token_type
         tok.value = lexeme
         tok.lineno = int(line)
         tok.lexpos = 0
         return tok
+
+class StreamingLexer(DummyLexer):
+    # Reads one token at a time from the .cl-lex file instead of loading
+    # the whole token list. Only usable through token(), i.e. with PLY.
+    def __init__(self, tokens_filename):
+        self.tokens = None
+        self.position = 0
+        try:
+            self.f = open(tokens_filename, 'r')
+        except FileNotFoundError:
+            print(f"ERROR: File '{tokens_filename}' not found.")
+            sys.exit(1)
+
+    def _get_token_line(self, tokens_lines):
+        line = tokens_lines.readline()
+        return line[:-1] if line.endswith('\n') else line
+
+    def token(self):
+        line = self._get_token_line(self.f)
+        if not line:
+            self.f.close()
+            return None
+        token_type = self._get_token_line(self.f)
+        if token_type in ['identifier', 'integer', 'type', 'string']:
+            token_lexeme = self._get_token_line(self.f)
+        else:
+            token_lexeme = token_type
+        self.position += 1
+        tok = lex.LexToken()
+        tok.type = token_type.upper()
+        tok.value = token_lexeme
+        tok.lineno = int(line)
+        tok.lexpos = 0
+        return tok
@@ -1,7 +1,10 @@
 import ply.yacc as yacc
 import sys
-from output_ast import OutputAST
-from lexer_cl import DummyLexer
+import time
+from output_ast import OutputAST, StreamingOutputAST
+from lexer_cl import DummyLexer, StreamingLexer
+from profiler import ParserProfiler
+from rd_parser import RecursiveDescentParser
 
 class CoolParser:
     # Should be uppercase for ply tokens, thus have more token types than lexer
@@ -63,15 +66,36 @@ class CoolParser:
     )
 
 
-    def __init__(self, lexer):
+    def __init__(self, lexer, profiler=None, class_sink=None):
         self.lexer = lexer
         self.parser = yacc.yacc(module=self)
         self.ast = None
+        self.profiler = profiler
+        # Called with every class as soon as it is reduced (see emit_class)
+        self.class_sink = class_sink
+        if self.profiler:
+            self.profiler.instrument(self.parser)
 
     def parse(self):
-        self.ast = self.parser.parse(lexer=self.lexer)
+        if not self.profiler:
+            self.ast = self.parser.parse(lexer=self.lexer)
+            return self.ast
+
+        token_function = self.profiler.wrap_token_function(self.lexer.token)
+        start = time.perf_counter()
+        self.ast = self.parser.parse(lexer=self.lexer, tokenfunc=token_function)
+        self.profiler.parse_time += time.perf_counter() - start
         return self.ast
 
+    def emit_class(self, class_tuple):
+        # With a class sink the class is handed over right away and only
+        # None is kept on the parser stack, so the program list never holds
+        # the class trees
+        if self.class_sink is None:
+            return class_tuple
+        self.class_sink(class_tuple)
+        return None
+
     # Grammar Rules
 
     def p_program_classlist(self, p):
@@ -88,11 +112,11 @@ class CoolParser:
 
     def p_class_noinherit(self, p):
         'class : CLASS type LBRACE featurelist RBRACE'
-        p[0] = (p.lineno(1), 'class_noinherit', p[2], p[4])
+        p[0] = self.emit_class((p.lineno(1), 'class_noinherit', p[2], p[4]))
 
     def p_class_inherit(self, p):
         'class : CLASS type INHERITS type LBRACE featurelist RBRACE'
-        p[0] = (p.lineno(1), 'class_inherit', p[2], p[4], p[6])
+        p[0] = self.emit_class((p.lineno(1), 'class_inherit', p[2], p[4], p[6]))
 
     def p_type(self, p):
         'type : TYPE'
@@ -302,20 +326,67 @@ class CoolParser:
             print("ERROR: Syntax error at EOF")
             sys.exit(1)
 
-def main():
+def parse_options(args):
+    # Returns (tokens_filename, options); options are given as "--name value"
+    tokens_filename = None
+    options = {}
+    i = 0
+    while i < len(args):
+        if args[i].startswith('--'):
+            if i + 1 >= len(args):
+                print(f"ERROR: Missing value for option {args[i]}")
+                sys.exit(1)
+            options[args[i][2:]] = args[i + 1]
+            i += 2
+        else:
+            tokens_filename = args[i]
+            i += 1
+    return tokens_filename, options
+
+def make_parser(engine, lexer, profiler=None, class_sink=None):
+    # 'ply' is the LALR driver generated by yacc, 'rd' the hand-written
+    # recursive descent engine. Both produce the same AST tuples.
+    if engine == 'ply':
+        return CoolParser(lexer, profiler, class_sink)
+    if engine == 'rd':
+        if profiler:
+            print("ERROR: Profiling is only supported by the ply engine")
+            sys.exit(1)
+        return RecursiveDescentParser(lexer, CoolParser.precedence, class_sink)
+    print(f"ERROR: Unknown parser engine '{engine}'")
+    sys.exit(1)
 
-    if len(sys.argv) < 2:
-        print("Usage: python parser.py <tokens_filename>")
+def main():
+    tokens_filename, options = parse_options(sys.argv[1:])
+    if tokens_filename is None:
+        print("Usage: python parser.py <tokens_filename> [--engine ply|rd] [--profile <report.json>] [--emit tree|stream]")
         sys.exit(1)
 
-    tokens_filename = sys.argv[1]
-    lexer = DummyLexer(tokens_filename)
-    parser = CoolParser(lexer)
-    ast = parser.parse()
-
+    engine = options.get('engine', 'ply')
+    emit = options.get('emit', 'tree')
+    if emit not in ['tree', 'stream']:
+        print(f"ERROR: Unknown emit mode '{emit}'")
+        sys.exit(1)
+    profiler = ParserProfiler() if 'profile' in options else None
     ast_filename = tokens_filename[:-3] + "ast"
-    output = OutputAST(ast, ast_filename)
-    output.output_ast_file()
+
+    if emit == 'stream':
+        # Classes are written as they are parsed. PLY pulls tokens one at a
+        # time, so it can read them from the file lazily as well.
+        lexer = StreamingLexer(tokens_filename) if engine == 'ply' else DummyLexer(tokens_filename)
+        output = StreamingOutputAST(ast_filename)
+        parser = make_parser(engine, lexer, profiler, output.add_class)
+        parser.parse()
+        output.output_ast_file()
+    else:
+        lexer = DummyLexer(tokens_filename)
+        parser = make_parser(engine, lexer, profiler)
+        ast = parser.parse()
+        output = OutputAST(ast, ast_filename)
+        output.output_ast_file()
+
+    if profiler:
+        profiler.write_json(options['profile'])
 
 
 if __name__ == "__main__":
@@ -1,4 +1,6 @@
+import shutil
 import sys
+import tempfile
 
 class OutputAST:
     def __init__(self, ast, output_filename):
@@ -175,3 +177,24 @@ class OutputAST:
     def output_ast_file(self):
         self.print_program(self.ast)
         self.fout.close()
+
+class StreamingOutputAST(OutputAST):
+    # Writes each class as soon as the parser hands it over, so the whole
+    # program never has to be held as one AST. The class count comes first
+    # in the .cl-ast format, so the classes are spooled to a temporary file
+    # and copied behind the count once the parse has finished.
+    def __init__(self, output_filename):
+        self.output_filename = output_filename
+        self.fout = tempfile.TemporaryFile('w+')
+        self.class_count = 0
+
+    def add_class(self, class_tuple):
+        self.print_class(class_tuple)
+        self.class_count += 1
+
+    def output_ast_file(self):
+        self.fout.seek(0)
+        with open(self.output_filename, 'w') as f:
+            f.write(str(self.class_count) + "\n")
+            shutil.copyfileobj(self.fout, f)
+        self.fout.close()
@@ -0,0 +1,209 @@
+from lexer_cl import DummyLexer
+from rd_parser import RecursiveDescentParser
+
+class ClassSpan:
+    # Token range of a class and of each of its features. Feature ranges
+    # are relative to the class start, so an edit in one class only has to
+    # move the start of the classes after it.
+    def __init__(self, start, end, features):
+        self.start = start
+        self.end = end
+        self.features = features
+
+class RegionError(Exception):
+    pass
+
+class SpanRecordingParser(RecursiveDescentParser):
+    def __init__(self, lexer, precedence):
+        super().__init__(lexer, precedence)
+        self.spans = []
+        self.feature_spans = None
+        self.in_region = False
+
+    def error(self):
+        if self.in_region:
+            # A region that does not parse on its own is reparsed with the
+            # whole file, which reports the error with the right token
+            raise RegionError()
+        super().error()
+
+    def parse_program(self):
+        self.spans = []
+        return super().parse_program()
+
+    def parse_class(self):
+        start = self.pos
+        self.feature_spans = []
+        class_tuple = super().parse_class()
+        features = [(s - start, e - start) for (s, e) in self.feature_spans]
+        self.spans.append(ClassSpan(start, self.pos, features))
+        self.feature_spans = None
+        return class_tuple
+
+    def parse_feature(self):
+        start = self.pos
+        feature = super().parse_feature()
+        if self.feature_spans is not None:
+            self.feature_spans.append((start, self.pos))
+        return feature
+
+    def parse_region(self, tokens):
+        # Parses "feature SEMI ... feature" and returns the features together
+        # with their spans relative to the start of the region
+        self.load_tokens(tokens)
+        self.in_region = True
+        self.feature_spans = []
+        features = []
+        try:
+            while True:
+                features.append(self.parse_feature())
+                if self.types[self.pos] == '$end':
+                    break
+                self.expect('SEMI')
+        finally:
+            self.in_region = False
+        spans = self.feature_spans
+        self.feature_spans = None
+        return features, spans
+
+def shift_lines(node, delta):
+    # Every int in the tuple AST is a line number (integer literals keep
+    # their lexeme as a string), so relocating a subtree adds delta to each
+    if isinstance(node, int):
+        return node + delta
+    if isinstance(node, tuple):
+        return tuple(shift_lines(child, delta) for child in node)
+    if isinstance(node, list):
+        return [shift_lines(child, delta) for child in node]
+    return node
+
+class ParseSession:
+    # Keeps the tokens, AST and class/feature token spans of the last parse
+    # so that an edit inside method bodies or attributes only reparses the
+    # features it touches. The new feature subtrees are spliced into the
+    # previous AST, which is equal to what a full parse would return.
+    def __init__(self, precedence):
+        self.parser = SpanRecordingParser(DummyLexer.from_tokens([]), precedence)
+        self.tokens = None
+        self.ast = None
+        self.spans = None
+        # 'full' or 'incremental', and the number of features reparsed
+        self.last_parse = None
+        self.reparsed_features = 0
+
+    def parse(self, tokens):
+        self.parser.lexer = DummyLexer.from_tokens(tokens)
+        self.ast = self.parser.parse()
+        self.tokens = tokens
+        self.spans = self.parser.spans
+        self.last_parse = 'full'
+        self.reparsed_features = sum(len(span.features) for span in self.spans)
+        return self.ast
+
+    def reparse(self, tokens, edit=None):
+        # edit is (start, old_end, new_end): the old tokens[start:old_end]
+        # were replaced by tokens[start:new_end]. An editor knows this range;
+        # without it the token lists are diffed, which is linear in the file.
+        if self.ast is None:
+            return self.parse(tokens)
+        if edit is None:
+            edit = self.find_edit(self.tokens, tokens)
+        else:
+            edit = edit + (self.line_delta(tokens, edit[1], edit[2]),)
+        if edit is None:
+            self.tokens = tokens
+            self.last_parse = 'incremental'
+            self.reparsed_features = 0
+            return self.ast
+        result = self.reparse_features(tokens, *edit)
+        if result is None:
+            return self.parse(tokens)
+        return result
+
+    def find_edit(self, old, new):
+        # Returns (start, old_end, new_end, line_delta), where old[start:old_end]
+        # was replaced by new[start:new_end], or None if nothing changed
+        limit = min(len(old), len(new))
+        start = 0
+        while start < limit and old[start] == new[start]:
+            start += 1
+        if start == len(old) == len(new):
+            return None
+
+        old_end = len(old)
+        new_end = len(new)
+        line_delta = 0
+        if old_end > start and new_end > start:
+            line_delta = int(new[-1][0]) - int(old[-1][0])
+        while old_end > start and new_end > start:
+            old_token = old[old_end - 1]
+            new_token = new[new_end - 1]
+            if old_token[1:] != new_token[1:] or int(new_token[0]) - int(old_token[0]) != line_delta:
+                break
+            old_end -= 1
+            new_end -= 1
+        return (start, old_end, new_end, line_delta)
+
+    def line_delta(self, tokens, old_end, new_end):
+        if old_end < len(self.tokens) and new_end < len(tokens):
+            return int(tokens[new_end][0]) - int(self.tokens[old_end][0])
+        return 0
+
+    def reparse_features(self, tokens, start, old_end, new_end, line_delta):
+        index = None
+        for i, span in enumerate(self.spans):
+            if span.start <= start and old_end <= span.end:
+                index = i
+                break
+        if index is None:
+            return None
+        span = self.spans[index]
+
+        # Features touching the edited range, as a contiguous run [first, last]
+        first = last = None
+        for i, (feature_start, feature_end) in enumerate(span.features):
+            if span.start + feature_start <= old_end and span.start + feature_end >= start:
+                if first is None:
+                    first = i
+                last = i
+        if first is None:
+            return None
+        region_start = span.start + span.features[first][0]
+        region_end = span.start + span.features[last][1]
+        if start < region_start or old_end > region_end:
+            return None
+
+        token_delta = len(tokens) - len(self.tokens)
+        try:
+            features, feature_spans = self.parser.parse_region(tokens[region_start:region_end + token_delta])
+        except RegionError:
+            return None
+
+        # Splice the new features into the class and relocate what follows
+        class_tuple = self.ast[index]
+        old_features = class_tuple[-1]
+        following = old_features[last + 1:]
+        if line_delta:
+            following = shift_lines(following, line_delta)
+        class_tuple = class_tuple[:-1] + (old_features[:first] + features + following,)
+
+        offset = region_start - span.start
+        span.features = (span.features[:first] +
+                         [(offset + s, offset + e) for (s, e) in feature_spans] +
+                         [(s + token_delta, e + token_delta) for (s, e) in span.features[last + 1:]])
+        span.end += token_delta
+
+        ast = self.ast[:index] + [class_tuple]
+        if line_delta:
+            ast += shift_lines(self.ast[index + 1:], line_delta)
+        else:
+            ast += self.ast[index + 1:]
+        for following_span in self.spans[index + 1:]:
+            following_span.start += token_delta
+            following_span.end += token_delta
+
+        self.ast = ast
+        self.tokens = tokens
+        self.last_parse = 'incremental'
+        self.reparsed_features = len(features)
+        return ast
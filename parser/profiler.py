@@ -0,0 +1,72 @@
+import json
+import time
+
+class ParserProfiler:
+    # Collects per-production statistics for a CoolParser run. Every bound
+    # p_* action of the PLY parser is wrapped so that we can count how often
+    # each rule reduces and how much time is spent inside its action.
+    def __init__(self):
+        self.rules = {}
+        self.shifts = 0
+        self.reduces = 0
+        self.max_stack_depth = 0
+        self.parse_time = 0.0
+
+    def instrument(self, lr_parser):
+        for production in lr_parser.productions:
+            if production.callable is None:
+                # Rule 0 (S' -> program) has no action attached
+                continue
+            if getattr(production.callable, 'profiled', False):
+                continue
+            production.callable = self._wrap_action(production)
+
+    def _wrap_action(self, production):
+        action = production.callable
+        stats = self.rules.setdefault(production.str, {
+            'rule': production.str,
+            'action': production.func,
+            'count': 0,
+            'time': 0.0
+        })
+        plen = production.len
+
+        def profiled_action(p):
+            # PLY has already popped the right-hand side off the stack,
+            # so add it back to get the depth right before the reduction
+            depth = len(p.stack) - 1 + plen
+            if depth > self.max_stack_depth:
+                self.max_stack_depth = depth
+            start = time.perf_counter()
+            action(p)
+            stats['time'] += time.perf_counter() - start
+            stats['count'] += 1
+            self.reduces += 1
+
+        profiled_action.profiled = True
+        return profiled_action
+
+    def wrap_token_function(self, token_function):
+        # Every token handed to the parser is shifted exactly once on a
+        # successful parse, so counting tokens gives the shift total.
+        def token():
+            tok = token_function()
+            if tok is not None:
+                self.shifts += 1
+            return tok
+        return token
+
+    def report(self):
+        rules = sorted(self.rules.values(), key=lambda r: (-r['time'], r['rule']))
+        return {
+            'parse_time': self.parse_time,
+            'shifts': self.shifts,
+            'reduces': self.reduces,
+            'max_stack_depth': self.max_stack_depth,
+            'rules': rules
+        }
+
+    def write_json(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+            f.write("\n")
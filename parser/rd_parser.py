@@ -0,0 +1,324 @@
+import sys
+
+class RecursiveDescentParser:
+    # Hand-written alternative to the PLY driver in CoolParser. Statements
+    # are parsed by recursive descent and operators by precedence climbing
+    # (Pratt parsing). It builds exactly the same AST tuples as the p_*
+    # actions of CoolParser and reports syntax errors on the same token.
+
+    # Operators that continue an expression, mapped to their AST tag
+    binary_operators = {
+        'PLUS': 'plus',
+        'MINUS': 'minus',
+        'TIMES': 'times',
+        'DIVIDE': 'divide',
+        'LT': 'lt',
+        'LE': 'le',
+        'EQUALS': 'eq'
+    }
+    postfix_operators = ('DOT', 'AT')
+
+    def __init__(self, lexer, precedence, class_sink=None):
+        self.lexer = lexer
+        self.ast = None
+        # Called with every class as soon as it is parsed, which is then not
+        # kept in the returned class list
+        self.class_sink = class_sink
+        # Same resolution rules as yacc: a rule takes the precedence of its
+        # rightmost terminal, and terminals without one are ('right', 0)
+        self.precedence = {}
+        for level, (assoc, *terminals) in enumerate(precedence, 1):
+            for terminal in terminals:
+                self.precedence[terminal] = (assoc, level)
+        self.infix = {}
+        for terminal in list(self.binary_operators) + list(self.postfix_operators):
+            self.infix[terminal] = self.rule_precedence(terminal)
+
+        self.prefix = {
+            'IDENTIFIER': self.parse_identifier_exp,
+            'INTEGER': self.parse_integer,
+            'STRING': self.parse_string,
+            'TRUE': self.parse_true,
+            'FALSE': self.parse_false,
+            'IF': self.parse_if,
+            'WHILE': self.parse_while,
+            'LBRACE': self.parse_block,
+            'NEW': self.parse_new,
+            'ISVOID': self.parse_isvoid,
+            'NOT': self.parse_not,
+            'TILDE': self.parse_negate,
+            'LPAREN': self.parse_paren_exp,
+            'LET': self.parse_let,
+            'CASE': self.parse_case
+        }
+
+    def rule_precedence(self, terminal):
+        return self.precedence.get(terminal, ('right', 0))
+
+    def parse(self):
+        self.load_tokens(self.lexer.tokens[self.lexer.position:])
+        self.ast = self.parse_program()
+        self.lexer.position = len(self.lexer.tokens)
+        return self.ast
+
+    def load_tokens(self, tokens):
+        self.types = [token[1] for token in tokens]
+        self.values = [token[2] for token in tokens]
+        self.lines = [token[0] for token in tokens]
+        # The sentinel saves a bounds check on every lookahead
+        self.types.append('$end')
+        self.pos = 0
+
+    # Token helpers
+
+    def error(self):
+        if self.types[self.pos] == '$end':
+            print("ERROR: Syntax error at EOF")
+            sys.exit(1)
+        print("ERROR:", int(self.lines[self.pos]), ": Parser: parse error near", self.values[self.pos])
+        sys.exit(1)
+
+    def expect(self, token_type):
+        if self.types[self.pos] != token_type:
+            self.error()
+        self.pos += 1
+        return self.pos - 1
+
+    def lineno(self, index):
+        return int(self.lines[index])
+
+    def parse_type(self):
+        index = self.expect('TYPE')
+        return (int(self.lines[index]), self.values[index])
+
+    def parse_identifier(self):
+        index = self.expect('IDENTIFIER')
+        return (int(self.lines[index]), self.values[index])
+
+    # Classes and features
+
+    def parse_program(self):
+        classlist = []
+        while True:
+            class_tuple = self.parse_class()
+            if self.class_sink is None:
+                classlist.append(class_tuple)
+            else:
+                self.class_sink(class_tuple)
+            self.expect('SEMI')
+            if self.types[self.pos] == '$end':
+                return classlist
+
+    def parse_class(self):
+        lineno = self.lineno(self.expect('CLASS'))
+        class_type = self.parse_type()
+        if self.types[self.pos] == 'INHERITS':
+            self.pos += 1
+            parent_type = self.parse_type()
+            featurelist = self.parse_featurelist()
+            return (lineno, 'class_inherit', class_type, parent_type, featurelist)
+        featurelist = self.parse_featurelist()
+        return (lineno, 'class_noinherit', class_type, featurelist)
+
+    def parse_featurelist(self):
+        self.expect('LBRACE')
+        featurelist = []
+        while self.types[self.pos] == 'IDENTIFIER':
+            featurelist.append(self.parse_feature())
+            self.expect('SEMI')
+        self.expect('RBRACE')
+        return featurelist
+
+    def parse_feature(self):
+        identifier = self.parse_identifier()
+        if self.types[self.pos] == 'LPAREN':
+            self.pos += 1
+            formallist = []
+            if self.types[self.pos] != 'RPAREN':
+                formallist.append(self.parse_formal())
+                while self.types[self.pos] == 'COMMA':
+                    self.pos += 1
+                    formallist.append(self.parse_formal())
+            self.expect('RPAREN')
+            self.expect('COLON')
+            return_type = self.parse_type()
+            self.expect('LBRACE')
+            body = self.parse_exp()
+            self.expect('RBRACE')
+            return (identifier[0], 'method', identifier, formallist, return_type, body)
+        return self.parse_attribute_rest(identifier)
+
+    def parse_formal(self):
+        identifier = self.parse_identifier()
+        self.expect('COLON')
+        return (identifier[0], identifier, self.parse_type())
+
+    def parse_attribute(self):
+        return self.parse_attribute_rest(self.parse_identifier())
+
+    def parse_attribute_rest(self, identifier):
+        self.expect('COLON')
+        attribute_type = self.parse_type()
+        if self.types[self.pos] == 'LARROW':
+            self.pos += 1
+            init = self.parse_exp(*self.rule_precedence('LARROW'))
+            return (identifier[0], 'attribute_init', identifier, attribute_type, init)
+        return (identifier[0], 'attribute_no_init', identifier, attribute_type)
+
+    # Expressions
+
+    def parse_exp(self, assoc='right', level=0):
+        # Parses the right-hand side of a rule whose precedence is
+        # (assoc, level), stopping where yacc would reduce that rule
+        prefix = self.prefix.get(self.types[self.pos])
+        if prefix is None:
+            self.error()
+        left = prefix()
+
+        while True:
+            operator = self.types[self.pos]
+            operator_precedence = self.infix.get(operator)
+            if operator_precedence is None:
+                return left
+            operator_assoc, operator_level = operator_precedence
+            if operator_level < level:
+                return left
+            if operator_level == level:
+                if assoc == 'left':
+                    return left
+                if assoc == 'nonassoc':
+                    self.error()
+
+            self.pos += 1
+            if operator == 'DOT':
+                left = self.parse_dynamic_dispatch(left)
+            elif operator == 'AT':
+                left = self.parse_static_dispatch(left)
+            else:
+                right = self.parse_exp(operator_assoc, operator_level)
+                left = (left[0], self.binary_operators[operator], left, right)
+
+    def parse_arguments(self):
+        self.expect('LPAREN')
+        if self.types[self.pos] == 'RPAREN':
+            self.pos += 1
+            return []
+        explist = [self.parse_exp()]
+        while self.types[self.pos] == 'COMMA':
+            self.pos += 1
+            explist.append(self.parse_exp())
+        self.expect('RPAREN')
+        return explist
+
+    def parse_dynamic_dispatch(self, exp):
+        identifier = self.parse_identifier()
+        return (exp[0], 'dynamic_dispatch', exp, identifier, self.parse_arguments())
+
+    def parse_static_dispatch(self, exp):
+        static_type = self.parse_type()
+        self.expect('DOT')
+        identifier = self.parse_identifier()
+        return (exp[0], 'static_dispatch', exp, static_type, identifier, self.parse_arguments())
+
+    def parse_identifier_exp(self):
+        identifier = self.parse_identifier()
+        if self.types[self.pos] == 'LARROW':
+            self.pos += 1
+            exp = self.parse_exp(*self.rule_precedence('LARROW'))
+            return (identifier[0], 'assign', identifier, exp)
+        if self.types[self.pos] == 'LPAREN':
+            return (identifier[0], 'self_dispatch', identifier, self.parse_arguments())
+        return (identifier[0], 'identifier', identifier)
+
+    def parse_integer(self):
+        self.pos += 1
+        return (self.lineno(self.pos - 1), 'integer', self.values[self.pos - 1])
+
+    def parse_string(self):
+        self.pos += 1
+        return (self.lineno(self.pos - 1), 'string', self.values[self.pos - 1])
+
+    def parse_true(self):
+        self.pos += 1
+        return (self.lineno(self.pos - 1), 'true')
+
+    def parse_false(self):
+        self.pos += 1
+        return (self.lineno(self.pos - 1), 'false')
+
+    def parse_if(self):
+        lineno = self.lineno(self.expect('IF'))
+        predicate = self.parse_exp()
+        self.expect('THEN')
+        then_exp = self.parse_exp()
+        self.expect('ELSE')
+        else_exp = self.parse_exp()
+        self.expect('FI')
+        return (lineno, 'if', predicate, then_exp, else_exp)
+
+    def parse_while(self):
+        lineno = self.lineno(self.expect('WHILE'))
+        predicate = self.parse_exp()
+        self.expect('LOOP')
+        body = self.parse_exp()
+        self.expect('POOL')
+        return (lineno, 'while', predicate, body)
+
+    def parse_block(self):
+        lineno = self.lineno(self.expect('LBRACE'))
+        explist = []
+        while True:
+            explist.append(self.parse_exp())
+            self.expect('SEMI')
+            if self.types[self.pos] == 'RBRACE':
+                self.pos += 1
+                return (lineno, 'block', explist)
+
+    def parse_new(self):
+        lineno = self.lineno(self.expect('NEW'))
+        return (lineno, 'new', self.parse_type())
+
+    def parse_isvoid(self):
+        lineno = self.lineno(self.expect('ISVOID'))
+        return (lineno, 'isvoid', self.parse_exp(*self.rule_precedence('ISVOID')))
+
+    def parse_not(self):
+        lineno = self.lineno(self.expect('NOT'))
+        return (lineno, 'not', self.parse_exp(*self.rule_precedence('NOT')))
+
+    def parse_negate(self):
+        lineno = self.lineno(self.expect('TILDE'))
+        return (lineno, 'negate', self.parse_exp(*self.rule_precedence('TILDE')))
+
+    def parse_paren_exp(self):
+        lineno = self.lineno(self.expect('LPAREN'))
+        exp = self.parse_exp()
+        self.expect('RPAREN')
+        return (lineno, 'paren_exp', exp)
+
+    def parse_let(self):
+        lineno = self.lineno(self.expect('LET'))
+        attributelist = [self.parse_attribute()]
+        while self.types[self.pos] == 'COMMA':
+            self.pos += 1
+            attributelist.append(self.parse_attribute())
+        self.expect('IN')
+        return (lineno, 'let', attributelist, self.parse_exp(*self.rule_precedence('IN')))
+
+    def parse_case(self):
+        lineno = self.lineno(self.expect('CASE'))
+        exp = self.parse_exp()
+        self.expect('OF')
+        elementlist = []
+        while True:
+            identifier = self.parse_identifier()
+            self.expect('COLON')
+            element_type = self.parse_type()
+            self.expect('RARROW')
+            body = self.parse_exp(*self.rule_precedence('RARROW'))
+            elementlist.append((identifier[0], identifier, element_type, body))
+            self.expect('SEMI')
+            if self.types[self.pos] != 'IDENTIFIER':
+                break
+        self.expect('ESAC')
+        return (lineno, 'case', exp, elementlist)
@@ -0,0 +1,141 @@
+import sys
+import time
+from bisect import bisect_left
+from lexer_cl import DummyLexer
+from rd_parser import RecursiveDescentParser
+
+# Skeleton parse mode for tools that only need class headers, attributes
+# and method signatures.
+#
+#   python3 skeleton_parser.py good.cl-lex [--scale 50] [--repeat 5]
+#
+# Checks that materializing the skeleton gives the same AST as a full parse
+# and times both on the token stream replicated --scale times.
+
+class LazyBody:
+    # Stands in for the body of a method in a skeleton AST. The body is
+    # parsed the first time exp() is called. Syntax errors inside the body
+    # are only reported at that point.
+    def __init__(self, parser, tokens, start, end):
+        self.parser = parser
+        # Token range of the body, up to and including the closing brace
+        self.tokens = tokens
+        self.start = start
+        self.end = end
+        self.body = None
+
+    def exp(self):
+        if self.body is None:
+            self.body = self.parser.parse_body(self.tokens[self.start:self.end])
+        return self.body
+
+class SkeletonParser(RecursiveDescentParser):
+    # Parses everything except method bodies, which are skipped by brace
+    # matching and replaced with a LazyBody
+    def __init__(self, lexer, precedence):
+        super().__init__(lexer, precedence)
+        self.body_parser = BodyParser(lexer, precedence)
+
+    def load_tokens(self, tokens):
+        super().load_tokens(tokens)
+        self.tokens = tokens
+        # Brace matching only has to walk the braces, not every token
+        self.braces = [i for i, token_type in enumerate(self.types) if token_type == 'LBRACE' or token_type == 'RBRACE']
+
+    def parse_feature(self):
+        if self.types[self.pos + 1] != 'LPAREN':
+            return super().parse_feature()
+        identifier = self.parse_identifier()
+        self.pos += 1
+        formallist = []
+        if self.types[self.pos] != 'RPAREN':
+            formallist.append(self.parse_formal())
+            while self.types[self.pos] == 'COMMA':
+                self.pos += 1
+                formallist.append(self.parse_formal())
+        self.expect('RPAREN')
+        self.expect('COLON')
+        return_type = self.parse_type()
+        self.expect('LBRACE')
+        start = self.pos
+        self.skip_braces()
+        body = LazyBody(self.body_parser, self.tokens, start, self.pos)
+        return (identifier[0], 'method', identifier, formallist, return_type, body)
+
+    def skip_braces(self):
+        # Moves past the RBRACE matching an LBRACE that was just consumed
+        types = self.types
+        braces = self.braces
+        depth = 1
+        for i in range(bisect_left(braces, self.pos), len(braces)):
+            index = braces[i]
+            if types[index] == 'LBRACE':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    self.pos = index + 1
+                    return
+        self.pos = len(types) - 1
+        self.error()
+
+class BodyParser(RecursiveDescentParser):
+    def parse_body(self, tokens):
+        # The closing brace is kept as the last token, so a body that ends
+        # early or runs on is reported on the same token as in a full parse
+        self.load_tokens(tokens)
+        body = self.parse_exp()
+        self.expect('RBRACE')
+        if self.types[self.pos] != '$end':
+            self.error()
+        return body
+
+def materialize(ast):
+    # Parses every remaining method body and returns the same AST a full
+    # parse would have built
+    classlist = []
+    for class_tuple in ast:
+        features = []
+        for feature in class_tuple[-1]:
+            if feature[1] == 'method' and isinstance(feature[5], LazyBody):
+                feature = feature[:5] + (feature[5].exp(),)
+            features.append(feature)
+        classlist.append(class_tuple[:-1] + (features,))
+    return classlist
+
+def main():
+    from compare_engines import replicate
+    from main import CoolParser, parse_options
+
+    filename, options = parse_options(sys.argv[1:])
+    if filename is None:
+        print("Usage: python3 skeleton_parser.py <tokens_filename> [--scale N] [--repeat N]")
+        sys.exit(1)
+    scale = int(options.get('scale', 50))
+    repeat = int(options.get('repeat', 5))
+
+    tokens = DummyLexer(filename).tokens
+    full_parser = RecursiveDescentParser(DummyLexer.from_tokens(tokens), CoolParser.precedence)
+    skeleton_parser = SkeletonParser(DummyLexer.from_tokens(tokens), CoolParser.precedence)
+    if materialize(skeleton_parser.parse()) != full_parser.parse():
+        print(f"{filename}: skeleton does not materialize to the full AST")
+        sys.exit(1)
+
+    big = replicate(tokens, scale)
+    times = {}
+    for name, parser in [('full', full_parser), ('skeleton', skeleton_parser)]:
+        best = None
+        for _ in range(repeat):
+            parser.lexer = DummyLexer.from_tokens(big)
+            start = time.perf_counter()
+            parser.parse()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        times[name] = best
+    print(f"{filename}: {len(big)} tokens, "
+          f"full {times['full']:.3f}s, skeleton {times['skeleton']:.3f}s, "
+          f"speedup {times['full'] / times['skeleton']:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -9,10 +9,11 @@ from ast_nodes import (
 )
 
 class ASTReader:
-    def __init__(self, filename, debug=False):
+    def __init__(self, filename, debug=False, interner=None):
         self.filename = filename
         self.file = open(filename, 'r')
         self.debug = debug  # Toggle debugging output
+        self.interner = interner  # Shares equal literal and operator subtrees
 
     def debug_print(self, message):
         if self.debug:
@@ -40,6 +41,11 @@ class ASTReader:
         self.debug_print(f"ID: (line={line}, id={id})")
         return (line, id)
 
+    def shared(self, expr):
+        if self.interner is None:
+            return expr
+        return self.interner.intern(expr)
+
     def getFormal(self):
         arg_name_lino = self.getLine()
         arg_name = self.getLine()
@@ -86,19 +92,19 @@ class ASTReader:
             return BlockExpr(lino, tag, body)
         elif tag in ['new', 'identifier']:
             name = self.getId()
-            return SimpleExpr(lino, tag, name)
+            return self.shared(SimpleExpr(lino, tag, name))
         elif tag in ['integer', 'string']:
             value = self.getLine()
-            return LiteralExpr(lino, tag, value)
+            return self.shared(LiteralExpr(lino, tag, value))
         elif tag in ['true', 'false']:
-            return LiteralExpr(lino, tag)
+            return self.shared(LiteralExpr(lino, tag))
         elif tag in ['negate', 'not', 'isvoid']:
             expr = self.getExpr()
-            return UnaryExpr(lino, tag, expr)
+            return self.shared(UnaryExpr(lino, tag, expr))
         elif tag in ['plus', 'minus', 'times', 'divide', 'lt', 'le', 'eq']:
             expr1 = self.getExpr()
             expr2 = self.getExpr()
-            return BinaryExpr(lino, tag, expr1, expr2)
+            return self.shared(BinaryExpr(lino, tag, expr1, expr2))
         elif tag == 'let':
             bindings = self.getList(self.getLetBinding)
             body = self.getExpr()
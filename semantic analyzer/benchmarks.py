@@ -0,0 +1,177 @@
+# benchmarks.py
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from ast_reader import ASTReader
+from class_table import ClassTable
+from formatter import ASTFormatter
+from main import SemanticAnalyzer, analyzeFile
+from node_interner import NodeInterner
+
+# Type checking benchmark on generated programs.
+#
+#   python3 benchmarks.py [--depth 300] [--methods 20] [--calls 20000] [--classes 1000] [--repeat 3]
+#
+# Writes a .cl-ast file with a Main class whose methods are --depth nested
+# lets. Every initializer reads the outermost and the previous variable,
+# so each identifier lookup sees the whole scope chain.
+#
+# A second program has a main method with a block of --calls dispatches,
+# alternately on self and on a new Main, to a method with eight formals.
+#
+# The last one is a hierarchy of --classes classes in chains of 20, each
+# with an initialized attribute and two methods. It is compiled in full
+# and with --check-only, to compare against writing the .cl-type file.
+#
+# Each program is also checked with a fresh --cache, once to fill it and
+# then again with every class a hit.
+#
+# The dispatch program is also read with and without --intern, to compare
+# the memory its AST takes.
+
+def nestedLetMethod(name, depth):
+    lines = ["method", "1", name, "0", "1", "Int"]
+    for i in range(depth):
+        lines += ["1", "let", "1", "let_binding_init", "1", f"x{i}", "1", "Int"]
+        if i == 0:
+            lines += ["1", "integer", "0"]
+        else:
+            lines += ["1", "plus", "1", "identifier", "1", "x0", "1", "identifier", "1", f"x{i - 1}"]
+    lines += ["1", "identifier", "1", f"x{depth - 1}"]
+    return lines
+
+def nestedLetProgram(depth, methods):
+    features = [nestedLetMethod(f"m{i}", depth) for i in range(methods)]
+    features.append(["method", "1", "main", "0", "1", "Object", "1", "integer", "0"])
+    lines = ["1", "1", "Main", "no_inherits", str(len(features))]
+    for feature in features:
+        lines += feature
+    return "\n".join(lines) + "\n"
+
+def dispatchProgram(calls, formals=8):
+    target = ["method", "1", "target", str(formals)]
+    for i in range(formals):
+        target += ["1", f"x{i}", "1", "Int"]
+    target += ["1", "Int", "1", "integer", "0"]
+    args = [str(formals)] + ["1", "integer", "0"] * formals
+    body = ["1", "block", str(calls)]
+    for i in range(calls):
+        if i % 2:
+            body += ["1", "dynamic_dispatch", "1", "new", "1", "Main", "1", "target"] + args
+        else:
+            body += ["1", "self_dispatch", "1", "target"] + args
+    main = ["method", "1", "main", "0", "1", "Object"] + body
+    lines = ["1", "1", "Main", "no_inherits", "2"] + target + main
+    return "\n".join(lines) + "\n"
+
+def hierarchyProgram(classes, depth=20):
+    lines = [str(classes + 1)]
+    for i in range(classes):
+        parent = f"C{i - 1}" if i % depth else "IO"
+        lines += ["1", f"C{i}", "inherits", "1", parent, "3"]
+        lines += ["attribute_init", "1", f"a{i}", "1", "Int", "1", "integer", str(i)]
+        lines += ["method", "1", f"m{i}", "1", "1", "x", "1", "Int", "1", "Int",
+                  "1", "plus", "1", "identifier", "1", "x", "1", "identifier", "1", f"a{i}"]
+        lines += ["method", "1", "f", "0", "1", "SELF_TYPE", "1", "identifier", "1", "self"]
+    lines += ["1", "Main", "no_inherits", "1", "method", "1", "main", "0", "1", "Object", "1", "integer", "0"]
+    return "\n".join(lines) + "\n"
+
+def timeProgram(text, timeFunction, *args):
+    fd, filename = tempfile.mkstemp(suffix='.cl-ast')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        return timeFunction(filename, *args)
+    finally:
+        os.remove(filename)
+        if os.path.exists(filename[:-3] + 'type'):
+            os.remove(filename[:-3] + 'type')
+
+def timeCompile(filename, options, repeat):
+    # The whole of main.py, from reading the AST to writing the output
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        analyzeFile(filename, options)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def timeCached(filename, repeat):
+    # (first run, best later run) of --check-only with a new cache file
+    fd, cacheFilename = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    try:
+        options = {'check-only': True, 'cache': cacheFilename}
+        cold = timeCompile(filename, options, 1)
+        return cold, timeCompile(filename, options, repeat)
+    finally:
+        os.remove(cacheFilename)
+
+def astMemory(filename, interned):
+    # (bytes allocated for the AST and the interner, interner)
+    interner = NodeInterner() if interned else None
+    tracemalloc.start()
+    try:
+        ast = ASTReader(filename, interner=interner).readAst()
+        return tracemalloc.get_traced_memory()[0], interner
+    finally:
+        tracemalloc.stop()
+
+def timeTypeCheck(filename, repeat):
+    best = None
+    for _ in range(repeat):
+        ast = ASTReader(filename).readAst()
+        classTable = ClassTable()
+        classTable.completeClassTable(ast)
+        analyzer = SemanticAnalyzer(ast, classTable, ASTFormatter())
+        start = time.perf_counter()
+        analyzer.analyze()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def main():
+    options = {}
+    args = sys.argv[1:]
+    for i in range(0, len(args) - 1, 2):
+        options[args[i].lstrip('-')] = args[i + 1]
+    depth = int(options.get('depth', 300))
+    methods = int(options.get('methods', 20))
+    repeat = int(options.get('repeat', 3))
+    calls = int(options.get('calls', 20000))
+    classes = int(options.get('classes', 1000))
+
+    # Nested lets recurse once per level in the reader and the checker
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10 * depth + 1000))
+
+    program = nestedLetProgram(depth, methods)
+    elapsed = timeProgram(program, timeTypeCheck, repeat)
+    print(f"nested lets: depth {depth}, {methods} methods, type check {elapsed:.3f}s")
+    checkOnly = timeProgram(program, timeCompile, {'check-only': True}, repeat)
+    cold, warm = timeProgram(program, timeCached, repeat)
+    print(f"nested lets: check-only {checkOnly:.3f}s, cache cold {cold:.3f}s, warm {warm:.3f}s")
+    program = dispatchProgram(calls)
+    elapsed = timeProgram(program, timeTypeCheck, repeat)
+    print(f"dispatch: {calls} call sites, type check {elapsed:.3f}s")
+    checkOnly = timeProgram(program, timeCompile, {'check-only': True}, repeat)
+    cold, warm = timeProgram(program, timeCached, repeat)
+    print(f"dispatch: check-only {checkOnly:.3f}s, cache cold {cold:.3f}s, warm {warm:.3f}s")
+    plain, _ = timeProgram(program, astMemory, False)
+    interned, interner = timeProgram(program, astMemory, True)
+    print(f"dispatch: AST {plain / 1e6:.1f} MB, interned {interned / 1e6:.1f} MB, "
+          f"{interner.reused} of {interner.offered} nodes shared")
+    program = hierarchyProgram(classes)
+    full = timeProgram(program, timeCompile, {}, repeat)
+    checkOnly = timeProgram(program, timeCompile, {'check-only': True}, repeat)
+    cold, warm = timeProgram(program, timeCached, repeat)
+    print(f"hierarchy: {classes} classes, full {full:.3f}s, check-only {checkOnly:.3f}s, "
+          f"cache cold {cold:.3f}s, warm {warm:.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# class_graph.py
+
+class ClassGraph:
+    # Parent links of a class table. A class has at most one parent, so
+    # Kahn's algorithm is a breadth-first walk from the classes without a
+    # defined parent: it orders classes parents first, in definition order
+    # among siblings, and every class it never reaches is on an inheritance
+    # cycle or inherits from one. Both passes are linear in the number of
+    # classes.
+    #
+    # parents maps each class to its parent, or None, in definition order.
+    def __init__(self, parents):
+        classes = list(parents)
+        self.index = {c: i for i, c in enumerate(classes)}
+        self.parent = parents
+        children = {c: [] for c in classes}
+        self.order = []
+        for c in classes:
+            parent = self.parent[c]
+            if parent in children:
+                children[parent].append(c)
+            else:
+                self.order.append(c)
+        i = 0
+        while i < len(self.order):
+            self.order.extend(children[self.order[i]])
+            i += 1
+        self.cycles = self.findCycles(classes)
+
+    def findCycles(self, classes):
+        # Each cycle starts at its last defined class and follows parent
+        # links, so cycle[-1] is the class inheriting from cycle[0]. Cycles
+        # are sorted by their last defined class.
+        ordered = set(self.order)
+        walked = {}
+        cycles = []
+        for start in classes:
+            if start in ordered or start in walked:
+                continue
+            c = start
+            while c not in walked:
+                walked[c] = start
+                c = self.parent[c]
+            if walked[c] != start:
+                # Joined a walk that already found its cycle
+                continue
+            members = [c]
+            member = self.parent[c]
+            while member != c:
+                members.append(member)
+                member = self.parent[member]
+            last = max(range(len(members)), key=lambda k: self.index[members[k]])
+            cycles.append(members[last:] + members[:last])
+        cycles.sort(key=lambda cycle: self.index[cycle[0]])
+        return cycles
@@ -0,0 +1,260 @@
+# class_snapshot.py
+
+import pickle
+import sys
+import time
+from array import array
+from multiprocessing import Pool, shared_memory
+from ast_nodes import FormalNode
+
+# Frozen class table for worker processes.
+#
+#   python3 class_snapshot.py <file.cl-ast> [--workers 4] [--tasks 2000]
+#
+# Compares sending the class table to a pool with every task against
+# workers that attach to one shared snapshot when they start.
+
+# Counts stored at the start of the buffer
+HEADER = ['strings', 'classes', 'attributes', 'methods', 'formals', 'pool']
+
+class ClassTableSnapshot:
+    # Read-only copy of the class names, parents, attribute and method
+    # signatures of a complete ClassTable, without the AST. Everything is in
+    # one buffer of int32 arrays followed by a UTF-8 string pool:
+    #
+    #   offsets    string i is pool[offsets[i]:offsets[i + 1]]
+    #   names      string id of each class, in class table order
+    #   parents    class id of each parent, -1 for Object
+    #   attrStart  attributes of class c are attrs[attrStart[c]:attrStart[c + 1]]
+    #   attrs      (name, type, has initializer) per attribute
+    #   methStart  methods of class c, as for attributes
+    #   methods    (name, return type, defining class, first formal) per method
+    #   formals    (name, type) per formal; a method's formals run up to the
+    #              first formal of the next method
+    #
+    # The buffer can be put in shared memory or inherited across fork, and a
+    # snapshot over it is built without copying or unpickling anything.
+    def __init__(self, buffer, sharedMemory=None):
+        self.sharedMemory = sharedMemory
+        self.buffer = memoryview(buffer)
+        counts = self.buffer[:len(HEADER) * 4].cast('i')
+        strings, classes, attributes, methods, formals, pool = counts
+        counts.release()
+        sizes = [strings + 1, classes, classes, classes + 1, 3 * attributes,
+                 classes + 1, 4 * methods + 4, 2 * formals]
+        views = []
+        offset = len(HEADER) * 4
+        for size in sizes:
+            views.append(self.buffer[offset:offset + size * 4].cast('i'))
+            offset += size * 4
+        (self.offsets, self.names, self.parents, self.attrStart, self.attrs,
+         self.methStart, self.methods, self.formals) = views
+        self.pool = self.buffer[offset:offset + pool]
+        # Lookups by name, built on first use in each process
+        self.stringIds = None
+        self.classIds = None
+        self.methodIndex = {}
+        self.attributeIndex = {}
+
+    @classmethod
+    def freeze(cls, classTable):
+        return cls(cls.pack(classTable))
+
+    @staticmethod
+    def pack(classTable):
+        strings = {}
+        def intern(s):
+            if s not in strings:
+                strings[s] = len(strings)
+            return strings[s]
+
+        classIds = {c: i for i, c in enumerate(classTable.data)}
+        names = array('i')
+        parents = array('i')
+        attrStart = array('i')
+        attrs = array('i')
+        methStart = array('i')
+        methods = array('i')
+        formals = array('i')
+        for c, entry in classTable.data.items():
+            names.append(intern(c))
+            parents.append(classIds.get(entry['parent'], -1))
+            attrStart.append(len(attrs) // 3)
+            for attribute in entry['attributes'].values():
+                attrs.extend([intern(attribute[0]), intern(attribute[1]), attribute[2] is not None])
+            methStart.append(len(methods) // 4)
+            for method in entry['methods'].values():
+                methods.extend([intern(method[0]), intern(method[2][1]), classIds[method[4]], len(formals) // 2])
+                for formal in method[1]:
+                    if isinstance(formal, FormalNode):
+                        formals.extend([intern(formal.arg_name), intern(formal.arg_type)])
+                    else:
+                        formals.extend([intern(formal[0]), intern(formal[1])])
+        attrStart.append(len(attrs) // 3)
+        methStart.append(len(methods) // 4)
+        # Sentinel so the formals of the last method have an end
+        methods.extend([0, 0, 0, len(formals) // 2])
+
+        pool = bytearray()
+        offsets = array('i', [0])
+        for s in strings:
+            pool += s.encode()
+            offsets.append(len(pool))
+
+        header = array('i', [len(strings), len(names), len(attrs) // 3,
+                             len(methods) // 4 - 1, len(formals) // 2, len(pool)])
+        out = bytearray()
+        for part in [header, offsets, names, parents, attrStart, attrs, methStart, methods, formals]:
+            out += part.tobytes()
+        return bytes(out + pool)
+
+    def share(self):
+        # Copies the buffer into a new shared memory block. The caller owns
+        # the block and unlinks it when the workers are done.
+        block = shared_memory.SharedMemory(create=True, size=len(self.buffer))
+        block.buf[:len(self.buffer)] = self.buffer
+        return block
+
+    @classmethod
+    def attach(cls, name):
+        block = shared_memory.SharedMemory(name=name)
+        return cls(block.buf, block)
+
+    def close(self):
+        # Views into shared memory must be released before it is closed
+        for view in [self.offsets, self.names, self.parents, self.attrStart, self.attrs,
+                     self.methStart, self.methods, self.formals, self.pool, self.buffer]:
+            view.release()
+        if self.sharedMemory is not None:
+            self.sharedMemory.close()
+            self.sharedMemory = None
+
+    def string(self, i):
+        return bytes(self.pool[self.offsets[i]:self.offsets[i + 1]]).decode()
+
+    def stringId(self, s):
+        if self.stringIds is None:
+            self.stringIds = {self.string(i): i for i in range(len(self.offsets) - 1)}
+        return self.stringIds.get(s)
+
+    def classId(self, name):
+        if self.classIds is None:
+            self.classIds = {self.string(n): c for c, n in enumerate(self.names)}
+        return self.classIds.get(name)
+
+    def allClasses(self):
+        return sorted(self.string(n) for n in self.names)
+
+    def getClass(self, name):
+        return name if self.classId(name) is not None else None
+
+    def getParent(self, name):
+        c = self.classId(name)
+        if c is None:
+            return None
+        parent = self.parents[c]
+        return None if parent < 0 else self.string(self.names[parent])
+
+    def getAttribute(self, className, attributeName):
+        # (name, type, has initializer), or None
+        c = self.classId(className)
+        if c is None:
+            return None
+        if c not in self.attributeIndex:
+            self.attributeIndex[c] = {self.attrs[3 * a]: a for a in range(self.attrStart[c], self.attrStart[c + 1])}
+        a = self.attributeIndex[c].get(self.stringId(attributeName))
+        if a is None:
+            return None
+        return (attributeName, self.string(self.attrs[3 * a + 1]), bool(self.attrs[3 * a + 2]))
+
+    def getMethod(self, className, methodName):
+        # (name, [(formal name, formal type)], return type, defining class),
+        # or None
+        c = self.classId(className)
+        if c is None:
+            return None
+        if c not in self.methodIndex:
+            self.methodIndex[c] = {self.methods[4 * m]: m for m in range(self.methStart[c], self.methStart[c + 1])}
+        m = self.methodIndex[c].get(self.stringId(methodName))
+        if m is None:
+            return None
+        formals = [(self.string(self.formals[2 * f]), self.string(self.formals[2 * f + 1]))
+                   for f in range(self.methods[4 * m + 3], self.methods[4 * m + 7])]
+        return (methodName, formals, self.string(self.methods[4 * m + 1]),
+                self.string(self.names[self.methods[4 * m + 2]]))
+
+def signatures(table, className):
+    # The task run by the benchmark workers
+    result = []
+    for name in ['abort', 'copy', 'type_name', 'main', 'f', 'g']:
+        result.append(table.getMethod(className, name))
+    return result
+
+workerSnapshot = None
+
+def attachWorker(name):
+    global workerSnapshot
+    workerSnapshot = ClassTableSnapshot.attach(name)
+
+def snapshotTask(className):
+    return signatures(workerSnapshot, className)
+
+def pickledTask(task):
+    data, className = task
+    return [m and (m[0], len(m[1]), m[2][1], m[4])
+            for m in (data[className]['methods'].get(name)
+                      for name in ['abort', 'copy', 'type_name', 'main', 'f', 'g'])]
+
+def main():
+    from ast_reader import ASTReader
+    from class_table import ClassTable
+
+    args = sys.argv[1:]
+    if not args:
+        print("Usage: python3 class_snapshot.py <file.cl-ast> [--workers 4] [--tasks 2000]")
+        sys.exit(1)
+    options = {}
+    for i in range(1, len(args) - 1, 2):
+        options[args[i].lstrip('-')] = args[i + 1]
+    workers = int(options.get('workers', 4))
+    tasks = int(options.get('tasks', 2000))
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+
+    ast = ASTReader(args[0]).readAst()
+    classTable = ClassTable()
+    classTable.completeClassTable(ast)
+    snapshot = ClassTableSnapshot.freeze(classTable)
+    classes = classTable.allClasses()
+    work = [classes[i % len(classes)] for i in range(tasks)]
+
+    # Every method signature must survive freezing
+    for c in classes:
+        for m in classTable.data[c]['methods'].values():
+            frozen = snapshot.getMethod(c, m[0])
+            if frozen[2] != m[2][1] or frozen[3] != m[4] or len(frozen[1]) != len(m[1]):
+                print(f"{args[0]}: snapshot differs for {c}.{m[0]}")
+                sys.exit(1)
+
+    start = time.perf_counter()
+    with Pool(workers) as pool:
+        pool.map(pickledTask, [(classTable.data, c) for c in work])
+    pickled = time.perf_counter() - start
+
+    block = snapshot.share()
+    try:
+        start = time.perf_counter()
+        with Pool(workers, initializer=attachWorker, initargs=(block.name,)) as pool:
+            pool.map(snapshotTask, work)
+        shared = time.perf_counter() - start
+    finally:
+        snapshot.close()
+        block.close()
+        block.unlink()
+
+    print(f"{args[0]}: {len(classes)} classes, pickled table {len(pickle.dumps(classTable.data))} bytes, "
+          f"snapshot {block.size} bytes")
+    print(f"{tasks} tasks on {workers} workers: pickled per task {pickled:.3f}s, "
+          f"shared snapshot {shared:.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,71 +1,100 @@
 # class_table.py
 
 from formatter import ASTFormatter
+from type_hierarchy import TypeHierarchy
+from class_graph import ClassGraph
+import io
 import sys
 from ast_nodes import ExprNode, LetExpr, CaseExpr, LetBinding, AssignExpr, \
     DynamicDispatchExpr, StaticDispatchExpr, SelfDispatchExpr, IfExpr, \
     BlockExpr, SimpleExpr, LiteralExpr, UnaryExpr, BinaryExpr, WhileExpr, FormalNode
 
+def featureTable(features):
+    # Attributes and methods of a class are kept in dicts keyed by name.
+    # Dicts preserve insertion order, which is the declaration order used
+    # by the class and implementation maps.
+    return {f[0]: f for f in features}
+
 class ClassTable:
     def __init__(self):
         self.data = {}
+        # allAttributes/allMethods results per class, cleared whenever a
+        # class or feature changes
+        self.layouts = {}
+        self.hierarchy = None
+        # Resolved (formal types, return type) per (class, method), cleared
+        # with the layouts
+        self.signatures = {}
         self.initializeBuiltInClasses()
 
     def initializeBuiltInClasses(self):
         # Initialize built-in classes: Object, Bool, Int, IO, String
         self.data['Object'] = {
             'parent': None,
-            'attributes': [],
-            'methods': [
+            'attributes': {},
+            'methods': featureTable([
                 ('abort', [], ('0', 'Object'), ('0', 'Object', 'internal', 'Object.abort'), 'Object'),
                 ('copy', [], ('0', 'SELF_TYPE'), ('0', 'SELF_TYPE', 'internal', 'Object.copy'), 'Object'),
                 ('type_name', [], ('0', 'String'), ('0', 'String', 'internal', 'Object.type_name'), 'Object')
-            ]
+            ])
         }
         self.data['Bool'] = {
             'parent': 'Object',
-            'attributes': [],
-            'methods': []
+            'attributes': {},
+            'methods': {}
         }
         self.data['Int'] = {
             'parent': 'Object',
-            'attributes': [],
-            'methods': []
+            'attributes': {},
+            'methods': {}
         }
         self.data['IO'] = {
             'parent': 'Object',
-            'attributes': [],
-            'methods': [
+            'attributes': {},
+            'methods': featureTable([
                 ('in_int', [], ('0', 'Int'), ('0', 'Int', 'internal', 'IO.in_int'), 'IO'),
                 ('in_string', [], ('0', 'String'), ('0', 'String', 'internal', 'IO.in_string'), 'IO'),
                 ('out_int', [('x', 'Int')], ('0', 'SELF_TYPE'), ('0', 'SELF_TYPE', 'internal', 'IO.out_int'), 'IO'),
                 ('out_string', [('x', 'String')], ('0', 'SELF_TYPE'), ('0', 'SELF_TYPE', 'internal', 'IO.out_string'), 'IO')
-            ]
+            ])
         }
         self.data['String'] = {
             'parent': 'Object',
-            'attributes': [],
-            'methods': [
+            'attributes': {},
+            'methods': featureTable([
                 ('concat', [('s', 'String')], ('0', 'String'), ('0', 'String', 'internal', 'String.concat'), 'String'),
                 ('length', [], ('0', 'Int'), ('0', 'Int', 'internal', 'String.length'), 'String'),
                 ('substr', [('i', 'Int'), ('l', 'Int')], ('0', 'String'), ('0', 'String', 'internal', 'String.substr'), 'String')
-            ]
+            ])
         }
 
     def completeClassTable(self, ast):
         for c in self.data:
             parent = self.data[c]['parent']
             if parent != None and parent in self.data:
-                parent_attributes = self.data[parent]['attributes'].copy()
-                parent_methods = self.data[parent]['methods'].copy()
-                self.data[c]['attributes'] += parent_attributes
-                self.data[c]['methods'] += parent_methods
+                for name, attribute in self.data[parent]['attributes'].items():
+                    self.data[c]['attributes'].setdefault(name, attribute)
+                for name, method in self.data[parent]['methods'].items():
+                    self.data[c]['methods'].setdefault(name, method)
+        self.invalidateLayouts()
+
+        # Parent links of every class, the first definition of a name
+        # winning as it does in addClass. A cycle is reported once the
+        # last of its classes has been added, as if each class were checked
+        # when it is added.
+        parents = {c: self.getParent(c) for c in self.data}
+        for c in ast:
+            parents.setdefault(c.class_name, c.parent_type)
+        graph = ClassGraph(parents)
+        closesCycle = {cycle[0] for cycle in graph.cycles}
 
         for c in ast:
             if c.class_name == 'SELFTYPE':
                 print(f"ERROR: {f.lino}: Type-Check: SELF_TYPE cannot be a class name")
                 sys.exit(1)
             self.addClass(c.class_name, c.parent_type, c.lino, c.parent_type_lino)
+            if c.class_name in closesCycle:
+                self.checkCircularInheritance(graph)
             for f in c.featureList:
                 if f.feature_type == "method":
                     self.addMethod(c.class_name, f)
@@ -79,16 +108,12 @@ class ClassTable:
             print("ERROR: 0: Type-Check: Main class not found")
             sys.exit(1)
         
-        has_main_method = False
-        for m in self.data['Main']['methods']:
-            if m[0] == 'main' and m[1] == []:
-                has_main_method = True
-        
-        if not has_main_method:
+        main_method = self.data['Main']['methods'].get('main')
+        if main_method is None or main_method[1] != []:
             print("ERROR: 0: Type-Check: main method with 0 param in Main class not found")
             sys.exit(1)
         
-        self.addinheritedAttributes()
+        self.addinheritedAttributes(graph)
     
 
     def validateParents(self):
@@ -99,20 +124,20 @@ class ClassTable:
                     print("ERROR:", self.data[c]["line"], f": Type-Check: class {c}'s parent {parent} not defined")
                     sys.exit(1)
 
-    def addinheritedAttributes(self):
-        for c in self.data:
-            parentList = []
+    def addinheritedAttributes(self, graph):
+        # Parents come before their children, so each class only has to
+        # take the features of its parent, which already has all of its own
+        for c in graph.order:
             parent = self.data[c]['parent']
-            while parent != None:
-                parentList.append(parent)
-                parent = self.data[parent]['parent']
-            for parent in parentList:
-                for attribute in self.data[parent]['attributes']:
-                    if self.getAttribute(c, attribute[0]) == None:
-                        self.data[c]['attributes'].append(attribute)
-                for method in self.data[parent]['methods']:
-                    if self.getMethod(c, method[0]) == None:
-                        self.data[c]['methods'].append(method)
+            if parent is None:
+                continue
+            attributes = self.data[c]['attributes']
+            methods = self.data[c]['methods']
+            for name, attribute in self.data[parent]['attributes'].items():
+                attributes.setdefault(name, attribute)
+            for name, method in self.data[parent]['methods'].items():
+                methods.setdefault(name, method)
+        self.invalidateLayouts()
                     
 
     def addClass(self, namee, parenttName, lino, parent_type_lino):
@@ -128,22 +153,21 @@ class ClassTable:
         if parenttName in self.data:
             self.data[namee] = {'parent': parenttName, 'attributes': self.data[parenttName]['attributes'].copy(), 'methods': self.data[parenttName]['methods'].copy()}
         else:
-            self.data[namee] = {'parent': parenttName, 'attributes': [], 'methods': [], "line": parent_type_lino}
-        (isCircular, cycle_class) = self.checkCircularInheritance(namee, set(), None)
-        if isCircular:
-            print("ERROR: 0: Type-Check: inheritance cycle:", cycle_class, namee)
-            sys.exit(1)
+            self.data[namee] = {'parent': parenttName, 'attributes': {}, 'methods': {}, "line": parent_type_lino}
 
+        self.invalidateLayouts()
         return self
     
-    def checkCircularInheritance(self, name, visited, lastclass):
-        if name in visited:
-            return (True, lastclass)
-        visited.add(name)
-        parent = self.getParent(name)
-        if parent is None or parent not in self.data:
-            return (False, None)
-        return self.checkCircularInheritance(parent, visited, name)
+    def checkCircularInheritance(self, graph):
+        # Reports every cycle, each as the class that closes it and the
+        # class inheriting from that one
+        for cycle in graph.cycles:
+            print("ERROR: 0: Type-Check: inheritance cycle:", cycle[-1], cycle[0])
+        if graph.cycles:
+            sys.exit(1)
+
+    def classGraph(self):
+        return ClassGraph({c: self.getParent(c) for c in self.data})
 
     def getClass(self, name):
         return name if name in self.data else None
@@ -155,26 +179,23 @@ class ClassTable:
         return sorted(self.data.keys())
 
     def addAttribute(self, className, feature):
-        for a in self.data[className]['attributes']:
-            if a[0] == feature.attribute_name:
-                print("ERROR:", feature.attribute_name_lino, ": Type-Check: class", className, "redefines attribute", feature.attribute_name)
-                sys.exit(1)
+        if feature.attribute_name in self.data[className]['attributes']:
+            print("ERROR:", feature.attribute_name_lino, ": Type-Check: class", className, "redefines attribute", feature.attribute_name)
+            sys.exit(1)
         if feature.attribute_name == 'self':
             print(f"ERROR: {feature.attribute_name_lino}: Type-Check: cann't name an attribute self")
             sys.exit(1)
 
         if feature.feature_type == "attribute_init":
-            self.data[className]['attributes'].append((feature.attribute_name, feature.attribute_type, feature.init_expr))
+            self.data[className]['attributes'][feature.attribute_name] = (feature.attribute_name, feature.attribute_type, feature.init_expr)
         elif feature.feature_type == "attribute_no_init":
-            self.data[className]['attributes'].append((feature.attribute_name, feature.attribute_type, None))
+            self.data[className]['attributes'][feature.attribute_name] = (feature.attribute_name, feature.attribute_type, None)
+        self.invalidateLayouts()
         return self
 
 
     def getAttribute(self, className, attributeName):
-        for a in self.data[className]['attributes']:
-            if a[0] == attributeName:
-                return a
-        return None
+        return self.data[className]['attributes'].get(attributeName)
 
     def findAttribute(self, className, attributeName):
         if className is None:
@@ -184,9 +205,31 @@ class ClassTable:
             return a
         return self.findAttribute(self.getParent(className), attributeName)
 
+    def invalidateLayouts(self):
+        self.layouts.clear()
+        self.signatures.clear()
+        self.hierarchy = None
+
+    def typeHierarchy(self):
+        # Subtype and least upper bound index, built on first use
+        if self.hierarchy is None:
+            self.hierarchy = TypeHierarchy(self)
+        return self.hierarchy
+
+    def layout(self, name):
+        # Cached (attributes, methods) of a class in inheritance order. The
+        # parent's layout is built first, so every class is computed once.
+        if name not in self.layouts:
+            self.layouts[name] = (self.buildAllAttributes(name), self.buildAllMethods(name))
+        return self.layouts[name]
+
     def allAttributes(self, name):
+        # The returned list is shared with the cache and must not be modified
         if name is None:
             return []
+        return self.layout(name)[0]
+
+    def buildAllAttributes(self, name):
         overrides = {}
         alist = []
         inheritedAttributes = self.allAttributes(self.getParent(name))
@@ -197,7 +240,7 @@ class ClassTable:
             else:
                 alist.append(x)
                 overrides[x[0]] = True
-        for a in self.data[name]['attributes']:
+        for a in self.data[name]['attributes'].values():
             if a[0] in overrides:
                 continue
             alist.append(a)
@@ -232,33 +275,43 @@ class ClassTable:
         return True
 
     def addMethod(self, className, feature):
-        overiding = False
-        method_to_overide = None
-        for methodd in self.data[className]['methods']:
-            inherited_method_name = methodd[0]
-            if inherited_method_name == feature.method_name:
-                inherited_method_formals = methodd[1]
-                overriding_method_formals = feature.formalsList
-                if not self.formalEquals(inherited_method_formals,overriding_method_formals):
-                    print(f"ERROR: {feature.method_name_lino}: Type-Check: Overiding function have different formals")
-                    exit(1)
-                if methodd[2][1] != feature.return_type:
-                    print(f"ERROR: {feature.return_type_lino}: Type-Check: Overiding function have different return types")
-                    exit(1)
-                overiding = True
-                method_to_overide = methodd
-        
-        if overiding:
-            self.data[className]['methods'].remove(method_to_overide)
+        methods = self.data[className]['methods']
+        methodd = methods.get(feature.method_name)
+        if methodd is not None and methodd[4] == className:
+            print(f"ERROR: {feature.method_name_lino}: Type-Check: class {className} redefines method {feature.method_name}")
+            sys.exit(1)
+        if methodd is not None:
+            inherited_method_formals = methodd[1]
+            overriding_method_formals = feature.formalsList
+            if not self.formalEquals(inherited_method_formals,overriding_method_formals):
+                print(f"ERROR: {feature.method_name_lino}: Type-Check: Overiding function have different formals")
+                exit(1)
+            if methodd[2][1] != feature.return_type:
+                print(f"ERROR: {feature.return_type_lino}: Type-Check: Overiding function have different return types")
+                exit(1)
+            # The overriding method moves to the end, as the list did before
+            del methods[feature.method_name]
 
-        self.data[className]['methods'].append((feature.method_name, feature.formalsList, (feature.return_type_lino ,feature.return_type), feature.body, className))
+        methods[feature.method_name] = (feature.method_name, feature.formalsList, (feature.return_type_lino ,feature.return_type), feature.body, className)
+        self.invalidateLayouts()
         return self
 
     def getMethod(self, className, methodName):
-        for m in self.data[className]['methods']:
-            if m[0] == methodName:
-                return m
-        return None
+        return self.data[className]['methods'].get(methodName)
+
+    def methodSignature(self, className, methodName):
+        # (formal types, return type) of a method of className, or None.
+        # Every dispatch to the same method shares the resolved tuple.
+        key = (className, methodName)
+        signature = self.signatures.get(key)
+        if signature is None:
+            m = self.getMethod(className, methodName)
+            if m is None:
+                return None
+            formalTypes = tuple(f.arg_type if isinstance(f, FormalNode) else f[1] for f in m[1])
+            signature = (formalTypes, m[2][1])
+            self.signatures[key] = signature
+        return signature
 
     def findMethod(self, className, methodName):
         if className is None:
@@ -269,8 +322,12 @@ class ClassTable:
         return self.findMethod(self.getParent(className), methodName)
 
     def allMethods(self, name):
+        # The returned list is shared with the cache and must not be modified
         if name is None:
             return []
+        return self.layout(name)[1]
+
+    def buildAllMethods(self, name):
         overrides = {}
         mlist = []
         inheritedMethods = self.allMethods(self.getParent(name))
@@ -281,7 +338,7 @@ class ClassTable:
             else:
                 mlist.append(x)
                 overrides[x[0]] = True
-        for m in self.data[name]['methods']:
+        for m in self.data[name]['methods'].values():
             if m[0] in overrides:
                 continue
             mlist.append(m)
@@ -292,61 +349,74 @@ class ClassTable:
             return []
         return self.allMethods(self.getParent(name))
 
+    # Each map is written one line at a time, so only the text of the
+    # feature being written is held in memory. The xxxMap methods return
+    # the same text without the final newline.
     def parentMap(self):
-        text = ['parent_map', str(len(self.data) - 1)]  # Exclude Object
+        return self.mapText(self.writeParentMap)
+
+    def classMap(self, formatter: ASTFormatter):
+        return self.mapText(self.writeClassMap, formatter)
+
+    def implementationMap(self, formatter: ASTFormatter, sharedBodies=False):
+        return self.mapText(self.writeImplementationMap, formatter, sharedBodies)
+
+    def mapText(self, writeMap, *args):
+        out = io.StringIO()
+        writeMap(out, *args)
+        return out.getvalue()[:-1]
+
+    def writeParentMap(self, out):
+        out.write(f"parent_map\n{len(self.data) - 1}\n")  # Exclude Object
         for cls in sorted(self.data.keys()):
             if cls == 'Object':
                 continue
-            text.append(cls)
-            text.append(self.data[cls]['parent'])
-        return "\n".join(text)
+            out.write(f"{cls}\n{self.data[cls]['parent']}\n")
 
-    def classMap(self, formatter: ASTFormatter):
-        text = ['class_map', str(len(self.data))]
+    def writeClassMap(self, out, formatter: ASTFormatter):
+        out.write(f"class_map\n{len(self.data)}\n")
         for cls in sorted(self.data.keys()):
-            text.append(cls)
             attributes = self.allAttributes(cls)
-            text.append(str(len(attributes)))
+            out.write(f"{cls}\n{len(attributes)}\n")
             for attr in attributes:
                 if attr[2] is None:
-                    text.append("no_initializer")
+                    out.write("no_initializer\n")
                 else:
-                    text.append("initializer")
-                text.append(attr[0])
-                text.append(attr[1])
+                    out.write("initializer\n")
+                out.write(f"{attr[0]}\n{attr[1]}\n")
                 if attr[2] is not None:
-                    text.append(formatter.formatExpr(attr[2]).rstrip("\n"))
-        return "\n".join(text)
+                    out.write(formatter.formatExpr(attr[2]).rstrip("\n"))
+                    out.write("\n")
 
-    def implementationMap(self, formatter: ASTFormatter):
-        text = ['implementation_map', str(len(self.data))]
+    def writeImplementationMap(self, out, formatter: ASTFormatter, sharedBodies=False):
+        # With sharedBodies, an inherited method is written as "inherited"
+        # in place of its body, which the code generator takes from the
+        # entry of the defining class. The map is then linear in the size
+        # of the program instead of repeating bodies down the hierarchy.
+        header = "implementation_map_shared" if sharedBodies else "implementation_map"
+        out.write(f"{header}\n{len(self.data)}\n")
         for cls in sorted(self.data.keys()):
-            text.append(cls)
             methods = self.allMethods(cls)
-            text.append(str(len(methods)))
+            out.write(f"{cls}\n{len(methods)}\n")
             for m in methods:
-                
-                text.append(m[0])
-                text.append(str(len(m[1])))
+                out.write(f"{m[0]}\n{len(m[1])}\n")
                 for f in m[1]:
                     if isinstance(f, FormalNode):
-                        text.append(f.arg_name)
+                        out.write(f"{f.arg_name}\n")
                     else:
-                        text.append(f[0])
-                
-                text.append(m[4])  # Defining class
-
-                
-                if isinstance(m[3], ExprNode):
-                    # text.append(formatter.formatExpr(m[3]).rstrip("\n"))
-                    text.append(formatter.formatExpr(m[3])[:-1])
+                        out.write(f"{f[0]}\n")
+
+                out.write(f"{m[4]}\n")  # Defining class
+
+                if sharedBodies and m[4] != cls:
+                    out.write("inherited\n")
+                elif isinstance(m[3], ExprNode):
+                    out.write(formatter.formatExpr(m[3])[:-1])
+                    out.write("\n")
                 else:
                     if len(m[3]) == 4 and m[3][0] == '0' and m[3][2] == 'internal':
-                        text.extend(m[3])
+                        for line in m[3]:
+                            out.write(f"{line}\n")
                     else:
-                        # text.append(formatter.formatExpr(m[3]).rstrip("\n"))
-                        text.append(formatter.formatExpr(m[3]))
-                
-
-
-        return "\n".join(text)
+                        out.write(formatter.formatExpr(m[3]))
+                        out.write("\n")
@@ -1,125 +1,167 @@
 # formatter.py
 
-from ast_nodes import (
-    ClassNode, MethodFeature, AttributeInitFeature, AssignExpr,
-    DynamicDispatchExpr, StaticDispatchExpr, SelfDispatchExpr,
-    IfExpr, BlockExpr, SimpleExpr, LiteralExpr, UnaryExpr,
-    BinaryExpr, LetExpr, CaseExpr, LetBinding, CaseElement,FormalNode, WhileExpr
-)
-
-class ASTFormatter:
+import io
+from ast_nodes import MethodFeature, AttributeInitFeature, FormalNode
+from visitor import ExprVisitor
+
+class ASTFormatter(ExprVisitor):
+    # Every part of the output is written into one buffer (a StringIO or an
+    # open file) instead of concatenating the text of each subtree, which
+    # copies a deep tree once per level. A method body or attribute
+    # initializer is formatted once and reused, since the class and
+    # implementation maps repeat inherited features in every subclass.
+    def __init__(self):
+        self.writeTable = self.dispatchTable('write')
+        self.formatted = {}
+
     def formatProgram(self, program):
-        return self.formatList(program, self.formatClass)
+        out = io.StringIO()
+        self.writeProgram(out, program)
+        return out.getvalue()
 
-    def formatList(self, items, formatFunction):
-        text = f"{len(items)}\n"
-        for item in items:
-            text += formatFunction(item)
+    def writeProgram(self, out, program):
+        self.writeList(out, program, self.writeClass)
+
+    def formatExpr(self, expr):
+        # Text of a method body or initializer, memoized per node
+        if not expr:
+            return ""
+        text = self.formatted.get(expr)
+        if text is None:
+            out = io.StringIO()
+            self.writeExpr(out, expr)
+            text = out.getvalue()
+            self.formatted[expr] = text
         return text
 
-    def formatId(self, idTuple):
-        return f"{idTuple[0]}\n{idTuple[1]}\n"
+    def writeList(self, out, items, writeFunction):
+        out.write(f"{len(items)}\n")
+        for item in items:
+            writeFunction(out, item)
+
+    def writeId(self, out, idTuple):
+        out.write(f"{idTuple[0]}\n{idTuple[1]}\n")
 
-    def formatFormal(self, formal):
+    def writeFormal(self, out, formal):
         if isinstance(formal, FormalNode):
-            nameFormatted = f"{formal.arg_name_lino}\n{formal.arg_name}\n"
-            typeFormatted = f"{formal.arg_type_lino}\n{formal.arg_type}\n"
+            out.write(f"{formal.arg_name_lino}\n{formal.arg_name}\n")
+            out.write(f"{formal.arg_type_lino}\n{formal.arg_type}\n")
         else:
-            nameFormatted = self.formatId(formal[0])
-            typeFormatted = self.formatId(formal[1])
-        return nameFormatted + typeFormatted
+            self.writeId(out, formal[0])
+            self.writeId(out, formal[1])
 
-    def formatExpr(self, expr):
+    def writeExpr(self, out, expr):
         if not expr:
-            return ""
-        text = f"{expr.line}\n"
-        if isinstance(expr, SimpleExpr):
-            if expr.name[1] == 'self':
-                text += f"SELF_TYPE\n"
-            else:
-                text += f"{expr.annotatedType}\n"
-        # elif isinstance(expr, BlockExpr):
-        #     text += f"{expr.sharedType}\n"
-        elif isinstance(expr, WhileExpr):
-            text += f"Object\n"
-        else:
-            text += f"{expr.annotatedType}\n"
-        
+            return
+        handler = self.writeTable.get(type(expr))
+        if handler is None:
+            raise ValueError(f'Unrecognized expression: {expr}')
+        handler(self, out, expr)
+
+    def writeHeader(self, out, expr, annotatedType):
+        out.write(f"{expr.line}\n{annotatedType}\n")
         if hasattr(expr, 'parent') and expr.parent:
-            text += f"{expr.parent}\n"
-        text += f"{expr.tag}\n"
-
-        if isinstance(expr, AssignExpr):
-            text += self.formatId(expr.var) + self.formatExpr(expr.rhs)
-        elif isinstance(expr, DynamicDispatchExpr):
-            text += self.formatExpr(expr.exp) + self.formatId(expr.method)
-            text += self.formatList(expr.args, self.formatExpr)
-        elif isinstance(expr, StaticDispatchExpr):
-            text += self.formatExpr(expr.exp) + self.formatId(expr.type)
-            text += self.formatId(expr.method) + self.formatList(expr.args, self.formatExpr)
-        elif isinstance(expr, SelfDispatchExpr):
-            text += self.formatId(expr.method) + self.formatList(expr.args, self.formatExpr)
-        elif isinstance(expr, IfExpr):
-            text += self.formatExpr(expr.predicate) + self.formatExpr(expr.thenExpr) + self.formatExpr(expr.elseExpr)
-        elif isinstance(expr, BlockExpr):
-            text += self.formatList(expr.body, self.formatExpr)
-        elif isinstance(expr, SimpleExpr):
-            text += self.formatId(expr.name)
-        elif isinstance(expr, LiteralExpr):
-            if expr.value or expr.value == "":
-                text += f"{expr.value}\n"
-        elif isinstance(expr, UnaryExpr):
-            text += self.formatExpr(expr.expr)
-        elif isinstance(expr, BinaryExpr):
-            text += self.formatExpr(expr.expr1) + self.formatExpr(expr.expr2)
-        elif isinstance(expr, LetExpr):
-            text += self.formatList(expr.bindings, self.formatLetBinding) + self.formatExpr(expr.body)
-        elif isinstance(expr, CaseExpr):
-            text += self.formatExpr(expr.expr) + self.formatList(expr.elementsList, self.formatCaseElement)
-        elif isinstance(expr, WhileExpr):
-            text += self.formatExpr(expr.predicate) + self.formatExpr(expr.body)
+            out.write(f"{expr.parent}\n")
+        out.write(f"{expr.tag}\n")
+
+    def writeAssignExpr(self, out, expr):
+        self.writeHeader(out, expr, expr.annotatedType)
+        self.writeId(out, expr.var)
+        self.writeExpr(out, expr.rhs)
+
+    def writeDynamicDispatchExpr(self, out, expr):
+        self.writeHeader(out, expr, expr.annotatedType)
+        self.writeExpr(out, expr.exp)
+        self.writeId(out, expr.method)
+        self.writeList(out, expr.args, self.writeExpr)
+
+    def writeStaticDispatchExpr(self, out, expr):
+        self.writeHeader(out, expr, expr.annotatedType)
+        self.writeExpr(out, expr.exp)
+        self.writeId(out, expr.type)
+        self.writeId(out, expr.method)
+        self.writeList(out, expr.args, self.writeExpr)
+
+    def writeSelfDispatchExpr(self, out, expr):
+        self.writeHeader(out, expr, expr.annotatedType)
+        self.writeId(out, expr.method)
+        self.writeList(out, expr.args, self.writeExpr)
+
+    def writeIfExpr(self, out, expr):
+        self.writeHeader(out, expr, expr.annotatedType)
+        self.writeExpr(out, expr.predicate)
+        self.writeExpr(out, expr.thenExpr)
+        self.writeExpr(out, expr.elseExpr)
+
+    def writeBlockExpr(self, out, expr):
+        self.writeHeader(out, expr, expr.annotatedType)
+        self.writeList(out, expr.body, self.writeExpr)
+
+    def writeSimpleExpr(self, out, expr):
+        if expr.name[1] == 'self':
+            self.writeHeader(out, expr, "SELF_TYPE")
         else:
-            raise ValueError(f'Unrecognized expression: {expr}')
-        return text
+            self.writeHeader(out, expr, expr.annotatedType)
+        self.writeId(out, expr.name)
+
+    def writeLiteralExpr(self, out, expr):
+        self.writeHeader(out, expr, expr.annotatedType)
+        if expr.value or expr.value == "":
+            out.write(f"{expr.value}\n")
+
+    def writeUnaryExpr(self, out, expr):
+        self.writeHeader(out, expr, expr.annotatedType)
+        self.writeExpr(out, expr.expr)
 
-    def formatLetBinding(self, binding):
-        text = f"{binding.bind}\n" + self.formatId(binding.var) + self.formatId(binding.type)
+    def writeBinaryExpr(self, out, expr):
+        self.writeHeader(out, expr, expr.annotatedType)
+        self.writeExpr(out, expr.expr1)
+        self.writeExpr(out, expr.expr2)
+
+    def writeLetExpr(self, out, expr):
+        self.writeHeader(out, expr, expr.annotatedType)
+        self.writeList(out, expr.bindings, self.writeLetBinding)
+        self.writeExpr(out, expr.body)
+
+    def writeCaseExpr(self, out, expr):
+        self.writeHeader(out, expr, expr.annotatedType)
+        self.writeExpr(out, expr.expr)
+        self.writeList(out, expr.elementsList, self.writeCaseElement)
+
+    def writeWhileExpr(self, out, expr):
+        self.writeHeader(out, expr, "Object")
+        self.writeExpr(out, expr.predicate)
+        self.writeExpr(out, expr.body)
+
+    def writeLetBinding(self, out, binding):
+        out.write(f"{binding.bind}\n")
+        self.writeId(out, binding.var)
+        self.writeId(out, binding.type)
         if binding.bind == 'let_binding_init' and binding.expr:
-            text += self.formatExpr(binding.expr)
-        return text
+            self.writeExpr(out, binding.expr)
 
-    def formatCaseElement(self, element):
-        return self.formatId(element.var) + self.formatId(element.type) + self.formatExpr(element.body)
+    def writeCaseElement(self, out, element):
+        self.writeId(out, element.var)
+        self.writeId(out, element.type)
+        self.writeExpr(out, element.body)
 
-    def formatFeature(self, feature):
+    def writeFeature(self, out, feature):
         # print(feature)
-        text = f"{feature.feature_type}\n"
+        out.write(f"{feature.feature_type}\n")
 
         if isinstance(feature, MethodFeature):
-            text += f"{feature.method_name_lino}\n{feature.method_name}\n"
-            text += self.formatList(feature.formalsList, self.formatFormal)
-            text += f"{feature.return_type_lino}\n{feature.return_type}\n"
-            text += self.formatExpr(feature.body)
+            out.write(f"{feature.method_name_lino}\n{feature.method_name}\n")
+            self.writeList(out, feature.formalsList, self.writeFormal)
+            out.write(f"{feature.return_type_lino}\n{feature.return_type}\n")
+            out.write(self.formatExpr(feature.body))
         else:
-            # text += self.formatId(feature.type)
-            text += f"{feature.attribute_name_lino}\n{feature.attribute_name}\n{feature.attribute_type_lino}\n{feature.attribute_type}\n"
+            out.write(f"{feature.attribute_name_lino}\n{feature.attribute_name}\n{feature.attribute_type_lino}\n{feature.attribute_type}\n")
             if isinstance(feature, AttributeInitFeature):
-                text += self.formatExpr(feature.init_expr)
-        # elif isinstance(feature, AttributeInitFeature):
-        #     text += self.formatId(feature.type)
-        #     if feature.init:
-        #         text += self.formatExpr(feature.init)
-        return text
+                out.write(self.formatExpr(feature.init_expr))
 
-    def formatClass(self, classNode):
-        text= f"{classNode.lino}\n{classNode.class_name}\n{classNode.tag}\n"
+    def writeClass(self, out, classNode):
+        out.write(f"{classNode.lino}\n{classNode.class_name}\n{classNode.tag}\n")
         if classNode.tag == 'inherits' and classNode.parent_type:
-            text += f"{classNode.parent_type_lino}\n{classNode.parent_type}\n"
+            out.write(f"{classNode.parent_type_lino}\n{classNode.parent_type}\n")
 
-        text += self.formatList(classNode.featureList, self.formatFeature)
-
-        # text = self.formatId(classNode.class_name) + f"{classNode.tag}\n"
-        # if classNode.tag == 'inherits' and classNode.parent:
-        #     text += self.formatId(classNode.parent)
-        # text += self.formatList(classNode.features, self.formatFeature)
-        return text
+        self.writeList(out, classNode.featureList, self.writeFeature)
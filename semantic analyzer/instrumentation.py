@@ -0,0 +1,132 @@
+# instrumentation.py
+
+import json
+import time
+from contextlib import contextmanager
+
+class SemanticProfiler:
+    # Collects timings and counters for one run of the semantic analyzer.
+    # Nothing is measured unless main.py is given --profile or --trace:
+    # instrument() replaces bound methods of one analyzer and its type
+    # checker with counting wrappers, so the classes themselves are
+    # unchanged and an uninstrumented run pays nothing.
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.classes = {}
+        self.methods = []
+        self.nodes = {}
+        self.counters = {
+            'symbol_lookups': 0,
+            'subtype_checks': 0,
+            'least_upper_bounds': 0,
+            'method_signature_lookups': 0
+        }
+        # Complete events in Chrome trace format, times in microseconds
+        self.events = []
+        self.cache = None
+        self.interner = None
+
+    def record(self, name, category, start, duration, args=None):
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': (start - self.start) * 1e6,
+            'dur': duration * 1e6,
+            'pid': 1,
+            'tid': 1
+        }
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + duration
+            self.record(name, 'phase', start, duration)
+
+    def instrument(self, analyzer):
+        checker = analyzer.typeChecker
+        classTable = analyzer.classTable
+        symbolTable = checker.symbolTable
+        self.cache = analyzer.cache
+        analyzer.typeCheckAttributes = self.wrapClassCheck(analyzer.typeCheckAttributes, 'attributes')
+        analyzer.typeCheckMethods = self.wrapClassCheck(analyzer.typeCheckMethods, 'methods')
+        analyzer.typeCheckMethod = self.wrapMethodCheck(analyzer.typeCheckMethod)
+        symbolTable.findSymbol = self.wrapCounter(symbolTable.findSymbol, 'symbol_lookups')
+        symbolTable.retrieve_identifier_type = self.wrapCounter(symbolTable.retrieve_identifier_type, 'symbol_lookups')
+        checker.compatible = self.wrapCounter(checker.compatible, 'subtype_checks')
+        checker.findSharedType = self.wrapCounter(checker.findSharedType, 'least_upper_bounds')
+        classTable.methodSignature = self.wrapCounter(classTable.methodSignature, 'method_signature_lookups')
+        # The dispatch table is per class, so the instance gets its own copy
+        checker.annotateTable = {nodeClass: self.wrapNodeHandler(handler, nodeClass.__name__)
+                                 for nodeClass, handler in checker.annotateTable.items()}
+
+    def wrapCounter(self, function, counter):
+        counters = self.counters
+        def counted(*args):
+            counters[counter] += 1
+            return function(*args)
+        return counted
+
+    def wrapNodeHandler(self, handler, name):
+        nodes = self.nodes
+        nodes.setdefault(name, 0)
+        def counted(checker, expr, self_typee):
+            nodes[name] += 1
+            return handler(checker, expr, self_typee)
+        return counted
+
+    def wrapClassCheck(self, check, part):
+        def timed(class_name):
+            start = time.perf_counter()
+            try:
+                return check(class_name)
+            finally:
+                duration = time.perf_counter() - start
+                stats = self.classes.setdefault(class_name, {'class': class_name, 'attributes': 0.0, 'methods': 0.0})
+                stats[part] += duration
+                self.record(f"{class_name} {part}", 'class', start, duration)
+        return timed
+
+    def wrapMethodCheck(self, check):
+        def timed(class_name, method):
+            start = time.perf_counter()
+            try:
+                return check(class_name, method)
+            finally:
+                duration = time.perf_counter() - start
+                self.methods.append({'class': class_name, 'method': method[0], 'defined_in': method[4], 'time': duration})
+                self.record(f"{class_name}.{method[0]}", 'method', start, duration)
+        return timed
+
+    def report(self):
+        report = {
+            'phases': self.phases,
+            'counters': self.counters,
+            'nodes': dict(sorted(self.nodes.items(), key=lambda n: (-n[1], n[0]))),
+            'classes': sorted(self.classes.values(), key=lambda c: (-(c['attributes'] + c['methods']), c['class'])),
+            'methods': sorted(self.methods, key=lambda m: (-m['time'], m['class'], m['method']))
+        }
+        if self.cache is not None:
+            report['cache'] = {'hits': self.cache.hits, 'misses': self.cache.misses}
+        if self.interner is not None:
+            report['interning'] = {'nodes': self.interner.offered, 'shared': self.interner.reused}
+        return report
+
+    def writeJson(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+            f.write("\n")
+
+    def writeTrace(self, filename):
+        # Loads in chrome://tracing and Perfetto
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+            f.write("\n")
@@ -1,25 +1,44 @@
 # main.py
 
 import sys
+from contextlib import nullcontext
 from ast_nodes import *
 from ast_reader import ASTReader
+from node_interner import NodeInterner
 from class_table import ClassTable
 from formatter import ASTFormatter
+from instrumentation import SemanticProfiler
 from symbol_table import SymbolTable
+from type_cache import TypeCheckCache, checkedExpressions
 from type_checker import TypeChecker
 
 class SemanticAnalyzer:
-    def __init__(self, ast, classTable, formatter):
+    def __init__(self, ast, classTable, formatter, cache=None):
         self.ast = ast
         self.classTable = classTable
         self.formatter = formatter
+        self.cache = cache
+        # Whether a cache hit has to put the stored types back on the
+        # nodes. Without a formatter nothing reads them.
+        self.keepAnnotations = formatter is not None
         self.symbolTable = SymbolTable()
         self.typeChecker = TypeChecker(classTable, formatter, self.symbolTable)
 
     def analyze(self):
         self.typeChecker.symbolTable.defining_types(self.all_available_types())
         for cls in self.ast:
-            self.typeCheckClass(cls)
+            if self.cache is None:
+                self.typeCheckClass(cls)
+            else:
+                # A hit annotates the class without checking it; only
+                # classes that checked without errors are ever stored
+                key = self.cache.classKey(self.classTable, cls.class_name)
+                roots = None
+                if self.keepAnnotations:
+                    roots = checkedExpressions(self.classTable, cls.class_name)
+                if not self.cache.load(key, roots):
+                    self.typeCheckClass(cls)
+                    self.cache.store(key, roots or checkedExpressions(self.classTable, cls.class_name))
             self.typeChecker.symbolTable.clearSymbolTable()
 
 
@@ -32,14 +51,9 @@ class SemanticAnalyzer:
                 if not self.classTable.getClass(parent):
                     self.reportError("0", f"Class {cls} inherits from non-existent class {parent}")
 
-                # Check for inheritance cycles
-                visited = []
-                current = parent
-                while current:
-                    if current in visited:
-                        self.reportError("0", f"Inheritance cycle detected involving class {cls}")
-                    visited.append(current)
-                    current = self.classTable.getParent(current)
+        # Check for inheritance cycles
+        for cycle in self.classTable.classGraph().cycles:
+            self.reportError("0", f"Inheritance cycle detected involving class {cycle[0]}")
 
     def registerFeatures(self, cls):
         className = cls.name[1]
@@ -77,7 +91,7 @@ class SemanticAnalyzer:
         return types
 
     def typeCheckAttributes(self, class_name):
-        attributes = self.classTable.data[class_name]['attributes']
+        attributes = self.classTable.data[class_name]['attributes'].values()
         for attribute in attributes:
             self.typeChecker.symbolTable.addClassSymbol(attribute[0], attribute[1])
         # print()
@@ -95,8 +109,7 @@ class SemanticAnalyzer:
     def typeCheckExpr(self, expr, self_typee):
         if not isinstance(expr, ExprNode):
             self.reportError(0, "Unrecognized instance in typeCheckExpr")
-        self.typeChecker.checkLetVarTypes(expr, self_typee)
-        type = self.typeChecker.annotateExpr(expr, self_typee)
+        type = self.typeChecker.checkExpr(expr, self_typee)
         return type
 
     def process_formal_list(self, formal_list):
@@ -120,41 +133,44 @@ class SemanticAnalyzer:
             
 
     def typeCheckMethods(self, class_name):
-        methods = self.classTable.data[class_name]['methods']
+        methods = self.classTable.data[class_name]['methods'].values()
         
         for method in methods:
             if method[4] != "IO":
-                self.typeChecker.symbolTable.clearScopeData()
-                scope_vars = self.process_formal_list(method[1])
-                self.typeChecker.symbolTable.enter_scope(scope_vars)
-                return_type = method[2][1]
-
-                method_body = method[3]
-
-                if isinstance(method_body, ExprNode):
-                    body_type = self.typeCheckExpr(method_body, class_name)
-                    
-                    if method_body.annotatedType != 'SELF_TYPE' and return_type == 'SELF_TYPE':
-                        self.reportError(method[2][0], "body and return type do not conform")
-                    
-                    if body_type == "SELF_TYPE":
-                        body_type = class_name
-                else:
-                    
-                    body_type = method_body[1]
-                    if body_type == "SELF_TYPE":
-                        body_type = method[4]
+                self.typeCheckMethod(class_name, method)
+
+    def typeCheckMethod(self, class_name, method):
+        self.typeChecker.symbolTable.clearScopeData()
+        scope_vars = self.process_formal_list(method[1])
+        self.typeChecker.symbolTable.enter_scope(scope_vars)
+        return_type = method[2][1]
+
+        method_body = method[3]
+
+        if isinstance(method_body, ExprNode):
+            body_type = self.typeCheckExpr(method_body, class_name)
+            
+            if method_body.annotatedType != 'SELF_TYPE' and return_type == 'SELF_TYPE':
+                self.reportError(method[2][0], "body and return type do not conform")
             
-                
+            if body_type == "SELF_TYPE":
+                body_type = class_name
+        else:
+            
+            body_type = method_body[1]
+            if body_type == "SELF_TYPE":
+                body_type = method[4]
+    
+        
 
-                if return_type == "SELF_TYPE":
-                    return_type = method[4]
-                if return_type not in self.typeChecker.symbolTable.types:
-                    self.reportError(method[2][0], f"return type {return_type} not declared")
-                
-                
-                if not self.typeChecker.compatible(return_type, body_type):
-                    self.reportError(0, f"body is type {body_type} while return type is {return_type}")
+        if return_type == "SELF_TYPE":
+            return_type = method[4]
+        if return_type not in self.typeChecker.symbolTable.types:
+            self.reportError(method[2][0], f"return type {return_type} not declared")
+        
+        
+        if not self.typeChecker.compatible(return_type, body_type):
+            self.reportError(0, f"body is type {body_type} while return type is {return_type}")
 
     def typeCheckClass(self, cls):
         className = cls.class_name
@@ -200,63 +216,122 @@ def print_nested_dict(d, indent=0):
             # If the value is not a dictionary, just print it
             print(value)
 
+def parseOptions(args):
+    # Returns (inputFilename, options). --check-only, --intern and
+    # --shared-bodies are flags, the other options are given as
+    # "--name value".
+    inputFilename = None
+    options = {}
+    i = 0
+    while i < len(args):
+        if args[i] in ['--check-only', '--intern', '--shared-bodies']:
+            options[args[i][2:]] = True
+            i += 1
+        elif args[i].startswith('--'):
+            if i + 1 >= len(args):
+                print(f"ERROR: Missing value for option {args[i]}")
+                sys.exit(1)
+            options[args[i][2:]] = args[i + 1]
+            i += 2
+        elif inputFilename is None:
+            inputFilename = args[i]
+            i += 1
+        else:
+            return None, options
+    return inputFilename, options
+
+def phase(profiler, name):
+    if profiler:
+        return profiler.phase(name)
+    return nullcontext()
+
+def analyzeFile(inputFilename, options, profiler=None):
+    # Initialize components
+    # --intern shares structurally equal literal and operator subtrees
+    interner = NodeInterner() if 'intern' in options else None
+    if profiler:
+        profiler.interner = interner
+    with phase(profiler, 'read'):
+        reader = ASTReader(inputFilename, interner=interner)
+        ast = reader.readAst()
+    # printAST(ast)
+    with phase(profiler, 'class_table'):
+        classTable = ClassTable()
+        classTable.completeClassTable(ast)
+    # print_nested_dict(classTable.data)
+    # print("________________________")
+
+    # --check-only stops after type checking: no formatter and no .cl-type
+    # file, only the diagnostics and the exit code
+    checkOnly = 'check-only' in options
+    formatter = None if checkOnly else ASTFormatter()
+
+    # --cache keeps type checking results of unchanged classes across runs
+    cache = None
+    if 'cache' in options:
+        maxBytes = int(float(options.get('cache-size', 64)) * 1024 * 1024)
+        cache = TypeCheckCache(options['cache'], maxBytes)
+
+    # Perform semantic analysis
+    analyzer = SemanticAnalyzer(ast, classTable, formatter, cache)
+    if profiler:
+        profiler.instrument(analyzer)
+    try:
+        with phase(profiler, 'type_check'):
+            analyzer.analyze()
+    finally:
+        # Classes checked before a type error are kept
+        if cache:
+            cache.close()
+    if checkOnly:
+        return
+
+    # --shared-bodies writes inherited methods in the implementation map
+    # as references to the defining class
+    sharedBodies = 'shared-bodies' in options
+
+    # Serialize output to .cl-type file
+    outputFilename = inputFilename.replace('.cl-ast', '.cl-type')
+    with open(outputFilename, 'w') as f:
+        # Each section is written as it is produced, not built as a string first
+        with phase(profiler, 'class_map'):
+            classTable.writeClassMap(f, formatter)
+        with phase(profiler, 'implementation_map'):
+            classTable.writeImplementationMap(f, formatter, sharedBodies)
+        with phase(profiler, 'parent_map'):
+            classTable.writeParentMap(f)
+        with phase(profiler, 'annotated_ast'):
+            formatter.writeProgram(f, ast)
+
+    # print(f"Semantic analysis completed successfully. Output written to {outputFilename}")
+
 def main():
-    # Ensure exactly one command-line argument is provided
-    if len(sys.argv) != 2:
-        print("Usage: python3 main.py <file.cl-ast>")
+    # Ensure exactly one input file is provided
+    inputFilename, options = parseOptions(sys.argv[1:])
+    if inputFilename is None:
+        print("Usage: python3 main.py <file.cl-ast> [--check-only] [--intern] [--shared-bodies] [--cache <file.sqlite>] [--cache-size <MB>] [--profile <report.json>] [--trace <trace.json>]")
         sys.exit(1)
 
-    inputFilename = sys.argv[1]
+    profiler = SemanticProfiler() if 'profile' in options or 'trace' in options else None
+
     if not inputFilename.endswith('.cl-ast'):
         print("ERROR: Input file must have a .cl-ast extension")
         sys.exit(1)
 
     try:
-        # Initialize components
-        reader = ASTReader(inputFilename)
-        ast = reader.readAst()
-        # printAST(ast)
-        classTable = ClassTable()
-        classTable.completeClassTable(ast)
-        # print_nested_dict(classTable.data)
-        # print("________________________")
-
-        formatter = ASTFormatter()
-
-        # Perform semantic analysis
-        analyzer = SemanticAnalyzer(ast, classTable, formatter)
-        analyzer.analyze()
-        
-
-        # Serialize output to .cl-type file
-        outputFilename = inputFilename.replace('.cl-ast', '.cl-type')
-        with open(outputFilename, 'w') as f:
-            # Write Class Map
-            classMap = classTable.classMap(formatter)
-            f.write(classMap + "\n")
-            
-            
-            # Write Implementation Map
-            implementationMap = classTable.implementationMap(formatter)
-            f.write(implementationMap + "\n")
-            
-            # Write Parent Map
-            parentMap = classTable.parentMap()
-            f.write(parentMap + "\n")
-            
-
-            # Write Annotated AST
-            annotatedAst = formatter.formatProgram(ast)
-            f.write(annotatedAst)
-
-        # print(f"Semantic analysis completed successfully. Output written to {outputFilename}")
-
+        analyzeFile(inputFilename, options, profiler)
     except FileNotFoundError:
         print(f"ERROR: File {inputFilename} not found")
         sys.exit(1)
     except Exception as e:
         print(f"ERROR: {str(e)}")
         sys.exit(1)
+    finally:
+        # Also written when a type error stops the analysis
+        if profiler and 'profile' in options:
+            profiler.writeJson(options['profile'])
+        if profiler and 'trace' in options:
+            profiler.writeTrace(options['trace'])
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,51 @@
+# node_interner.py
+
+from ast_nodes import SimpleExpr, LiteralExpr, UnaryExpr, BinaryExpr
+
+class NodeInterner:
+    # Hash-consing for the expressions whose type does not depend on where
+    # they appear: literals, new T, and unary and binary operators over
+    # such expressions. ASTReader passes it every node it builds, children
+    # first, and structurally equal nodes come back as one shared node.
+    #
+    # The line is part of the key, since the annotated AST and the error
+    # messages print it for every node. Sharing therefore happens within a
+    # line, which is where generated programs repeat themselves. Identifiers
+    # and dispatches are never shared; their type depends on the scope and
+    # on the class being checked.
+    #
+    # The checker only ever writes the same annotatedType on a shared node,
+    # and passes that keep results per node (the formatter, the type cache)
+    # see the same subtree every time.
+    def __init__(self):
+        self.nodes = {}
+        # ids of the shared nodes, which stay alive in self.nodes
+        self.canonical = set()
+        self.offered = 0
+        self.reused = 0
+
+    def key(self, expr):
+        kind = type(expr)
+        if kind is LiteralExpr:
+            return (kind, expr.line, expr.tag, expr.value)
+        if kind is SimpleExpr and expr.tag == 'new':
+            return (kind, expr.line, expr.tag, expr.name)
+        # Children are interned first, so equal subtrees are the same node
+        if kind is UnaryExpr and id(expr.expr) in self.canonical:
+            return (kind, expr.line, expr.tag, id(expr.expr))
+        if kind is BinaryExpr and id(expr.expr1) in self.canonical and id(expr.expr2) in self.canonical:
+            return (kind, expr.line, expr.tag, id(expr.expr1), id(expr.expr2))
+        return None
+
+    def intern(self, expr):
+        key = self.key(expr)
+        if key is None:
+            return expr
+        self.offered += 1
+        shared = self.nodes.get(key)
+        if shared is None:
+            self.nodes[key] = expr
+            self.canonical.add(id(expr))
+            return expr
+        self.reused += 1
+        return shared
@@ -0,0 +1,270 @@
+# query.py
+
+import io
+import sys
+import time
+from bisect import bisect_right
+from contextlib import redirect_stdout
+from ast_nodes import (ExprNode, MethodFeature, AssignExpr, DynamicDispatchExpr, StaticDispatchExpr,
+                       SelfDispatchExpr, SimpleExpr, LetBinding, CaseElement)
+from ast_reader import ASTReader
+from class_table import ClassTable
+from main import SemanticAnalyzer
+from node_interner import NodeInterner
+from type_cache import TypeCheckCache
+
+# Editor queries over an analyzed program.
+#
+#   python3 query.py <file.cl-ast>
+#
+# Reads one query per line from stdin and prints the answer:
+#
+#   type <line> [name]          type of the expression at a line
+#   definition <class> <method> class and line that define a method
+#   goto <line> <method>        definition of the method dispatched at a line
+#   members <class>             attributes and methods, inherited ones included
+#   reload                      analyze the file again after an edit
+
+class Span:
+    # An expression and the lines it covers, which include the lines of all
+    # its subexpressions. The parent is the span of the expression it is a
+    # subexpression of, or None for a method body or attribute initializer.
+    def __init__(self, node, start, end, depth, className, feature):
+        self.node = node
+        self.start = start
+        self.end = end
+        self.depth = depth
+        self.className = className
+        self.feature = feature
+        self.parent = None
+
+def namedToken(expr):
+    # The (line, name) an editor would point at to mean this expression
+    if isinstance(expr, SimpleExpr):
+        return expr.name
+    if isinstance(expr, AssignExpr):
+        return expr.var
+    if isinstance(expr, (DynamicDispatchExpr, StaticDispatchExpr, SelfDispatchExpr)):
+        return expr.method
+    return None
+
+def subexpressions(expr):
+    children = []
+    for value in vars(expr).values():
+        if isinstance(value, ExprNode):
+            children.append(value)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, ExprNode):
+                    children.append(item)
+                elif isinstance(item, LetBinding) and item.expr is not None:
+                    children.append(item.expr)
+                elif isinstance(item, CaseElement):
+                    children.append(item.body)
+    return children
+
+class SemanticModel:
+    # Keeps the class table and the annotated AST of the last successful
+    # analysis, with indexes for the queries an editor repeats:
+    #
+    #   spans        expression spans sorted by first line, for the
+    #                innermost expression around a line (bisect, then up
+    #                the enclosing expressions)
+    #   names        (line, name) to the spans of identifiers, assignments
+    #                and dispatches with that name on that line
+    #   definitions  (class, feature) to the line that declares it
+    #   memberTables members of each class, built on first request
+    #
+    # The AST is read with a NodeInterner, so the model keeps one node for
+    # equal literal and operator subtrees on a line.
+    #
+    # update() analyzes the file again. Type checking results are kept in an
+    # in-memory TypeCheckCache, so only the classes whose key changed since
+    # an earlier version are checked again. If the new version has an
+    # error, the previous model keeps answering.
+    def __init__(self, cacheBytes=64 * 1024 * 1024):
+        self.cache = TypeCheckCache(":memory:", cacheBytes)
+        self.ast = None
+        self.classTable = None
+        self.spans = []
+        self.starts = []
+        self.names = {}
+        self.definitions = {}
+        self.memberTables = {}
+        # Classes type checked and taken from the cache by the last update
+        self.checked = 0
+        self.reused = 0
+
+    def update(self, filename):
+        # Returns None, or the error that stopped the analysis
+        output = io.StringIO()
+        hits, misses = self.cache.hits, self.cache.misses
+        try:
+            with redirect_stdout(output):
+                ast = ASTReader(filename, interner=NodeInterner()).readAst()
+                classTable = ClassTable()
+                classTable.completeClassTable(ast)
+                self.cache.clearProgram()
+                analyzer = SemanticAnalyzer(ast, classTable, None, self.cache)
+                analyzer.keepAnnotations = True
+                analyzer.analyze()
+        except SystemExit:
+            return output.getvalue().strip()
+        except Exception as e:
+            return f"ERROR: {str(e)}"
+        self.ast = ast
+        self.classTable = classTable
+        self.checked = self.cache.misses - misses
+        self.reused = self.cache.hits - hits
+        self.buildIndex()
+        self.memberTables = {}
+        return None
+
+    def buildIndex(self):
+        spans = []
+        self.names = {}
+        self.definitions = {}
+        for cls in self.ast:
+            self.definitions[(cls.class_name, None)] = int(cls.lino)
+            for feature in cls.featureList:
+                if isinstance(feature, MethodFeature):
+                    name, line, root = feature.method_name, feature.method_name_lino, feature.body
+                else:
+                    name, line, root = feature.attribute_name, feature.attribute_name_lino, getattr(feature, 'init_expr', None)
+                self.definitions[(cls.class_name, name)] = int(line)
+                if isinstance(root, ExprNode):
+                    self.indexExpression(root, cls.class_name, name, spans)
+
+        spans.sort(key=lambda s: (s.start, -s.end, s.depth))
+        self.spans = spans
+        self.starts = [span.start for span in spans]
+
+    def indexExpression(self, root, className, feature, spans):
+        # Iterative. A span is made when its expression is first reached, as
+        # a child of the span it was reached from; a shared node gets a span
+        # for every place it appears. Its lines are final once all of its
+        # children are done, and then widen those of its parent.
+        stack = [(root, None, False)]
+        while stack:
+            expr, span, expanded = stack.pop()
+            if not expanded:
+                line = int(expr.line)
+                parent = span
+                span = Span(expr, line, line, 0 if parent is None else parent.depth + 1, className, feature)
+                span.parent = parent
+                stack.append((expr, span, True))
+                for child in subexpressions(expr):
+                    stack.append((child, span, False))
+                continue
+            parent = span.parent
+            if parent is not None:
+                parent.start = min(parent.start, span.start)
+                parent.end = max(parent.end, span.end)
+            spans.append(span)
+            token = namedToken(expr)
+            if token is not None:
+                self.names.setdefault((int(token[0]), token[1]), []).append(span)
+
+    def spanAt(self, line, name=None):
+        if name is not None:
+            spans = self.names.get((line, name))
+            return max(spans, key=lambda s: s.depth) if spans else None
+        i = bisect_right(self.starts, line) - 1
+        span = self.spans[i] if i >= 0 else None
+        while span is not None and span.end < line:
+            span = span.parent
+        return span
+
+    def typeAt(self, line, name=None):
+        # Type of the innermost expression around line; with a name, of the
+        # identifier, assignment or dispatch with that name on the line
+        span = self.spanAt(line, name)
+        if span is None:
+            return None
+        return getattr(span.node, 'annotatedType', None)
+
+    def definition(self, className, methodName):
+        # (defining class, line) of the method className dispatches to, or
+        # None. Built-in methods have no line.
+        if self.classTable is None or className not in self.classTable.data:
+            return None
+        method = self.classTable.getMethod(className, methodName)
+        if method is None:
+            return None
+        return (method[4], self.definitions.get((method[4], methodName)))
+
+    def definitionAt(self, line, methodName):
+        # Definition of the method dispatched at line, from the static type
+        # of the receiver
+        span = self.spanAt(line, methodName)
+        if span is None:
+            return None
+        expr = span.node
+        if isinstance(expr, StaticDispatchExpr):
+            receiver = expr.type[1]
+        elif isinstance(expr, DynamicDispatchExpr):
+            receiver = getattr(expr.exp, 'annotatedType', None)
+            if receiver == 'SELF_TYPE':
+                receiver = span.className
+        elif isinstance(expr, SelfDispatchExpr):
+            receiver = span.className
+        else:
+            return None
+        return self.definition(receiver, methodName)
+
+    def members(self, className):
+        # [('attribute', name, type, defining class) ...,
+        #  ('method', name, (formal types, return type), defining class) ...]
+        if className not in self.memberTables:
+            if self.classTable is None or className not in self.classTable.data:
+                return None
+            data = self.classTable.data
+            members = []
+            for name, attribute in data[className]['attributes'].items():
+                # An inherited attribute is the parent's tuple
+                owner = className
+                while data[owner]['parent'] in data and data[data[owner]['parent']]['attributes'].get(name) is attribute:
+                    owner = data[owner]['parent']
+                members.append(('attribute', name, attribute[1], owner))
+            for name, method in data[className]['methods'].items():
+                members.append(('method', name, self.classTable.methodSignature(className, name), method[4]))
+            self.memberTables[className] = members
+        return self.memberTables[className]
+
+def answer(model, filename, words):
+    if words[0] in ['type', 'goto'] and len(words) > 1 and not words[1].isdecimal():
+        return f"ERROR: Bad line number: {words[1]}"
+    if words[0] == 'type' and len(words) in [2, 3]:
+        return model.typeAt(int(words[1]), words[2] if len(words) == 3 else None)
+    if words[0] == 'definition' and len(words) == 3:
+        return model.definition(words[1], words[2])
+    if words[0] == 'goto' and len(words) == 3:
+        return model.definitionAt(int(words[1]), words[2])
+    if words[0] == 'members' and len(words) == 2:
+        members = model.members(words[1])
+        return None if members is None else "\n".join(" ".join(map(str, m)) for m in members)
+    if words[0] == 'reload' and len(words) == 1:
+        start = time.perf_counter()
+        error = model.update(filename)
+        if error:
+            return error
+        return f"{model.checked} classes checked, {model.reused} reused, {time.perf_counter() - start:.3f}s"
+    return f"ERROR: Unknown query: {' '.join(words)}"
+
+def main():
+    if len(sys.argv) != 2 or not sys.argv[1].endswith('.cl-ast'):
+        print("Usage: python3 query.py <file.cl-ast>")
+        sys.exit(1)
+    filename = sys.argv[1]
+    model = SemanticModel()
+    error = model.update(filename)
+    if error:
+        print(error)
+        sys.exit(1)
+    for line in sys.stdin:
+        words = line.split()
+        if words:
+            print(answer(model, filename, words), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,73 @@
 # symbol_table.py
 
 class SymbolTable:
-    """A simple symbol table to manage scopes and symbols."""
+    """A scoped symbol table with constant-time insert, lookup and scope pop.
+
+    Every name maps to a stack of the types it is bound to, innermost last,
+    so the innermost binding shadows the outer ones. Each open scope keeps
+    the names it bound, which is the undo log used to pop it. Attributes of
+    the current class are looked up after all scopes.
+    """
     def __init__(self):
-        self.class_data = []
-        self.types = []
-        self.scope_data =[]
+        self.class_data = {}
+        self.types = set()
+        self.bindings = {}
+        self.scope_data = []
         # self.class_methods = []
 
     def addClassSymbol(self, name, type):
-        self.class_data.append((name, type))
+        # The first attribute with a name wins, as with the old list scan
+        self.class_data.setdefault(name, type)
 
     def defining_types(self, type_list):
-        self.types = type_list
-        self.types.append("SELF_TYPE")
+        self.types = set(type_list)
+        self.types.add("SELF_TYPE")
 
     def defining_methods(self, method_list):
         self.methods = method_list
 
     def clearSymbolTable(self):
-        self.class_data = []
-        self.scope_data = []
+        self.class_data = {}
+        self.clearScopeData()
 
     def clearScopeData(self):
+        self.bindings = {}
         self.scope_data = []
-        
+
     def recognize_type(self, type):
         if type in self.types:
             return True
         return False
-    
+
     def retrieve_identifier_type(self, identifier):
-        for scope in self.scope_data:
-            for (name, type) in scope:
-                if name == identifier:
-                    return type
-        for (name, type) in self.class_data:
-            if name == identifier:
-                return type
-        return None
+        types = self.bindings.get(identifier)
+        if types:
+            return types[-1]
+        return self.class_data.get(identifier)
 
     def enter_scope(self, scope_data):
-        new_scope = []
+        names = []
+        seen = set()
         for name, type in scope_data:
-            new_scope.append((name, type))
-        self.scope_data.append(new_scope)
+            # Within one scope the first binding of a name is the one seen
+            if name in seen:
+                continue
+            seen.add(name)
+            names.append(name)
+            self.bindings.setdefault(name, []).append(type)
+        self.scope_data.append(names)
 
     def exit_scope(self):
-        self.scope_data.pop()
-
-    # def startScope(self):
-    #     self.data.append(("SCOPE", None))
-
-    # def clearScope(self):
-    #     i = len(self.data) - 1
-    #     while i > 0 and self.data[i][0] != "SCOPE":
-    #         i -= 1
-    #     self.data = self.data[:i]
+        for name in self.scope_data.pop():
+            types = self.bindings[name]
+            types.pop()
+            if not types:
+                del self.bindings[name]
 
     def findSymbol(self, name):
-        for scope in self.scope_data:
-            for (n, t) in scope:
-                if name == n:
-                    return (n, t)
-        for (n, t) in self.class_data:
-            if name == n:
-                return (n, t)
+        types = self.bindings.get(name)
+        if types:
+            return (name, types[-1])
+        if name in self.class_data:
+            return (name, self.class_data[name])
         return None
-    # def isInScope(self, name):
-    #     for (n, d) in reversed(self.data):
-    #         if n == name:
-    #             return (n, d)
-    #         if n == "SCOPE":
-    #             return None
-    #     return None
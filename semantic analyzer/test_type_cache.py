@@ -0,0 +1,83 @@
+# test_type_cache.py
+
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from ast_reader import ASTReader
+from class_table import ClassTable
+from main import SemanticAnalyzer
+from type_cache import TypeCheckCache
+
+# Regression tests for TypeCheckCache keys.
+#
+#   python3 -m unittest test_type_cache
+
+def program(formals):
+    # .cl-ast of
+    #
+    #   class Main inherits IO {
+    #     f(<formals> : Int) : Int { x + 1 };
+    #     main() : Object { out_int(f(1)) };
+    #   };
+    lines = ["1", "1", "Main", "inherits", "1", "IO", "2",
+             "method", "2", "f", str(len(formals))]
+    for name in formals:
+        lines += ["2", name, "2", "Int"]
+    lines += ["2", "Int", "2", "plus", "2", "identifier", "2", "x", "2", "integer", "1",
+              "method", "3", "main", "0", "3", "Object",
+              "3", "self_dispatch", "3", "out_int", "1",
+              "3", "self_dispatch", "3", "f", str(len(formals))]
+    lines += ["3", "integer", "1"] * len(formals)
+    return "\n".join(lines) + "\n"
+
+class TypeCheckCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = TypeCheckCache(os.path.join(self.directory.name, "types.sqlite"))
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def analyze(self, source, cache=None):
+        # (what the analyzer printed, exit status)
+        filename = os.path.join(self.directory.name, "program.cl-ast")
+        with open(filename, "w") as f:
+            f.write(source)
+        output = io.StringIO()
+        status = 0
+        with redirect_stdout(output):
+            try:
+                ast = ASTReader(filename).readAst()
+                classTable = ClassTable()
+                classTable.completeClassTable(ast)
+                if cache is not None:
+                    cache.clearProgram()
+                SemanticAnalyzer(ast, classTable, None, cache).analyze()
+            except SystemExit as e:
+                status = 1 if e.code is None else e.code
+        return output.getvalue(), status
+
+    def assertMissLike(self, edited):
+        # The edited program misses the cache and reports what an uncached
+        # run reports
+        self.assertEqual(self.analyze(program(["x"]), self.cache)[1], 0)
+        misses = self.cache.misses
+        expected = self.analyze(edited)
+        self.assertNotEqual(expected[1], 0)
+        self.assertEqual(self.analyze(edited, self.cache), expected)
+        self.assertGreater(self.cache.misses, misses)
+
+    def testRenamedFormal(self):
+        self.assertMissLike(program(["y"]))
+
+    def testDuplicateFormal(self):
+        self.assertMissLike(program(["x", "x"]))
+
+    def testFormalNamedSelf(self):
+        self.assertMissLike(program(["self"]))
+
+if __name__ == "__main__":
+    unittest.main()
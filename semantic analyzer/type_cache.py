@@ -0,0 +1,290 @@
+# type_cache.py
+
+import hashlib
+import os
+import sqlite3
+import time
+import zlib
+from ast_nodes import ExprNode, FormalNode
+
+# Sources whose behaviour a cached result depends on. Editing any of them
+# changes every key, so results of an older analyzer are never reused.
+ANALYZER_SOURCES = ['ast_nodes.py', 'ast_reader.py', 'class_graph.py', 'class_table.py', 'main.py',
+                    'symbol_table.py', 'type_cache.py', 'type_checker.py', 'type_hierarchy.py', 'visitor.py']
+
+# Node fields that do not change the result of checking a class. Line
+# numbers only appear in errors, and errors are never cached.
+IGNORED_FIELDS = {'line', 'annotatedType', 'sharedType'}
+
+# Fields hashed for each node class, found from its first instance
+nodeFields = {}
+
+def checkedExpressions(classTable, className):
+    # Roots type checked for a class: the initializers of all its attributes
+    # and the bodies of all its methods, inherited ones included, in the
+    # order typeCheckClass visits them
+    roots = []
+    for attribute in classTable.data[className]['attributes'].values():
+        if attribute[2] is not None:
+            roots.append(attribute[2])
+    for method in classTable.data[className]['methods'].values():
+        if method[4] != "IO" and isinstance(method[3], ExprNode):
+            roots.append(method[3])
+    return roots
+
+def ownFeatures(classTable, className):
+    # Attributes and methods declared in className itself. Inherited
+    # attributes are the parent's tuples, inherited methods name the class
+    # that defines them.
+    entry = classTable.data[className]
+    parent = classTable.data.get(entry['parent'], {'attributes': {}})
+    attributes = [a for name, a in entry['attributes'].items() if parent['attributes'].get(name) is not a]
+    methods = [m for m in entry['methods'].values() if m[4] == className]
+    return attributes, methods
+
+def declaredFormals(method):
+    # [(name, type)] of a method's formals, in order. The checker binds the
+    # names in the body and rejects duplicates and self, so they are part of
+    # the result as much as the types.
+    return [(f.arg_name, f.arg_type) if isinstance(f, FormalNode) else (f[0], f[1]) for f in method[1]]
+
+def walk(root):
+    # Returns (digest of the tree, expression nodes in preorder, type names
+    # it mentions). Iterative, since lets and blocks can nest deeper than
+    # the recursion limit.
+    tokens = []
+    nodes = []
+    typeNames = set()
+    stack = [root]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        item = pop()
+        kind = type(item)
+        if kind is tuple:
+            # (line, name) pairs; type names start with an upper case letter
+            name = item[-1]
+            if name[:1].isupper():
+                typeNames.add(name)
+            tokens.append("(" + name)
+        elif kind is list:
+            tokens.append(f"[{len(item)}")
+            stack.extend(reversed(item))
+        elif kind is str or kind is int or item is None:
+            tokens.append(repr(item))
+        else:
+            fields = nodeFields.get(kind)
+            if fields is None:
+                fields = [name for name in vars(item) if name not in IGNORED_FIELDS]
+                fields.reverse()
+                nodeFields[kind] = fields
+            if isinstance(item, ExprNode):
+                nodes.append(item)
+            tokens.append(kind.__name__)
+            values = vars(item)
+            for name in fields:
+                push(values[name])
+    return hashlib.sha256("\n".join(tokens).encode()).hexdigest(), nodes, typeNames
+
+class TypeCheckCache:
+    # On-disk cache of per-class type checking results, shared by every run
+    # that points at the same SQLite file. A class that checks without
+    # errors stores the annotated type of every expression node it visited,
+    # in preorder. On a hit the types are put back on the nodes and the
+    # class is not checked.
+    #
+    # The key of a class hashes the analyzer sources, the features it
+    # declares (formals and bodies without line numbers), the interfaces of every class
+    # reachable from it or named in those bodies, and the key of its parent,
+    # which covers everything it inherits. Editing a method body only misses
+    # for its class and the subclasses; changing a signature also misses for
+    # the classes that can see it.
+    #
+    # Entries are evicted least recently used first once the stored
+    # annotations exceed maxBytes.
+    def __init__(self, path, maxBytes=64 * 1024 * 1024):
+        self.maxBytes = maxBytes
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS classes ("
+            "key TEXT PRIMARY KEY, annotations BLOB NOT NULL, "
+            "size INTEGER NOT NULL, used REAL NOT NULL)")
+        self.totalBytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM classes").fetchone()[0]
+        self.version = self.analyzerVersion()
+        self.clearProgram()
+        self.hits = 0
+        self.misses = 0
+
+    def clearProgram(self):
+        # Keys and walked trees belong to one AST. A cache that outlives it
+        # forgets them before the next program is analyzed.
+        self.interfaces = None
+        self.keys = {}
+        self.trees = {}
+
+    def analyzerVersion(self):
+        digest = hashlib.sha256()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in ANALYZER_SOURCES:
+            with open(os.path.join(directory, name), 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def tree(self, root):
+        # walk(root), once per tree; inherited bodies are shared
+        if id(root) not in self.trees:
+            self.trees[id(root)] = walk(root)
+        return self.trees[id(root)]
+
+    def interface(self, classTable, className):
+        # What other classes can see of the features className declares,
+        # and the classes that mentions
+        attributes, methods = ownFeatures(classTable, className)
+        attributes = [(a[0], a[1]) for a in attributes]
+        methods = [(m[0], classTable.methodSignature(className, m[0])) for m in methods]
+        parent = classTable.data[className]['parent']
+        referenced = [parent] + [a[1] for a in attributes]
+        for _, (formalTypes, returnType) in methods:
+            referenced += formalTypes
+            referenced.append(returnType)
+        referenced = [r for r in referenced if r is not None and r != 'SELF_TYPE']
+        return repr((className, parent, attributes, methods)), referenced
+
+    def interfaceDigests(self, classTable):
+        # Hashes, for every class, its interface and the interfaces of all
+        # classes reachable from it. Classes can refer to each other, so the
+        # hash is built over strongly connected components (Tarjan), each
+        # combining its members with the components it refers to, which
+        # come out of Tarjan's algorithm first.
+        texts = {}
+        edges = {}
+        for c in classTable.data:
+            texts[c], edges[c] = self.interface(classTable, c)
+        digests = {}
+        index = {}
+        low = {}
+        stack = []
+        onStack = set()
+        for root in classTable.data:
+            if root in index:
+                continue
+            work = [(root, iter(edges[root]))]
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            onStack.add(root)
+            while work:
+                c, children = work[-1]
+                for child in children:
+                    if child not in edges:
+                        # Undefined classes are reported by the checker
+                        continue
+                    if child not in index:
+                        index[child] = low[child] = len(index)
+                        stack.append(child)
+                        onStack.add(child)
+                        work.append((child, iter(edges[child])))
+                        break
+                    if child in onStack:
+                        low[c] = min(low[c], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[c])
+                    if low[c] == index[c]:
+                        members = []
+                        while True:
+                            member = stack.pop()
+                            onStack.discard(member)
+                            members.append(member)
+                            if member == c:
+                                break
+                        inside = set(members)
+                        digest = hashlib.sha256()
+                        for member in sorted(members):
+                            digest.update(texts[member].encode())
+                        outside = {digests[r] for m in members for r in edges[m] if r in digests and r not in inside}
+                        for d in sorted(outside):
+                            digest.update(d.encode())
+                        for member in members:
+                            digests[member] = digest.hexdigest()
+        return digests
+
+    def classKey(self, classTable, className):
+        # Keys are built parents first, each from its parent's key
+        if self.interfaces is None:
+            self.interfaces = self.interfaceDigests(classTable)
+        chain = []
+        c = className
+        while c in classTable.data and c not in self.keys:
+            chain.append(c)
+            c = classTable.data[c]['parent']
+        for c in reversed(chain):
+            digest = hashlib.sha256()
+            parent = classTable.data[c]['parent']
+            digest.update(f"{self.version} {c} {self.interfaces[c]} {self.keys.get(parent)}\n".encode())
+            attributes, methods = ownFeatures(classTable, c)
+            roots = [a[2] for a in attributes if a[2] is not None]
+            roots += [m[3] for m in methods if isinstance(m[3], ExprNode)]
+            for m in methods:
+                digest.update(f"{m[0]} {declaredFormals(m)!r}\n".encode())
+            typeNames = set()
+            for root in roots:
+                treeDigest, _, treeTypes = self.tree(root)
+                digest.update(treeDigest.encode())
+                typeNames |= treeTypes
+            for name in sorted(typeNames):
+                digest.update(f"{name} {self.interfaces.get(name, 'missing')}\n".encode())
+            self.keys[c] = digest.hexdigest()
+        return self.keys[className]
+
+    def nodes(self, roots):
+        # Expression nodes under roots, in preorder
+        nodes = []
+        for root in roots:
+            nodes += self.tree(root)[1]
+        return nodes
+
+    def load(self, key, roots=None):
+        # True on a hit. Unless roots is None, the nodes under them get the
+        # types they had when the class was checked.
+        row = self.connection.execute("SELECT annotations FROM classes WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return False
+        if roots is not None:
+            nodes = self.nodes(roots)
+            types = zlib.decompress(row[0]).decode().split("\n") if nodes else []
+            if len(types) != len(nodes):
+                self.misses += 1
+                return False
+            for node, annotatedType in zip(nodes, types):
+                node.annotatedType = annotatedType
+        self.connection.execute("UPDATE classes SET used = ? WHERE key = ?", (time.time(), key))
+        self.hits += 1
+        return True
+
+    def store(self, key, roots):
+        types = [getattr(node, 'annotatedType', None) for node in self.nodes(roots)]
+        if None in types:
+            return
+        annotations = zlib.compress("\n".join(types).encode())
+        old = self.connection.execute("SELECT size FROM classes WHERE key = ?", (key,)).fetchone()
+        if old is not None:
+            self.totalBytes -= old[0]
+        self.connection.execute("INSERT OR REPLACE INTO classes VALUES (?, ?, ?, ?)",
+                                (key, annotations, len(annotations), time.time()))
+        self.totalBytes += len(annotations)
+        self.evict()
+
+    def evict(self):
+        while self.totalBytes > self.maxBytes:
+            row = self.connection.execute("SELECT key, size FROM classes ORDER BY used LIMIT 1").fetchone()
+            if row is None:
+                break
+            self.connection.execute("DELETE FROM classes WHERE key = ?", (row[0],))
+            self.totalBytes -= row[1]
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,89 @@
+# type_hierarchy.py
+
+class TypeHierarchy:
+    # Index over the inheritance tree of a complete class table. Every class
+    # gets DFS pre/post numbers, so "source conforms to dest" is an interval
+    # test, and a binary lifting table of ancestors, so the least upper bound
+    # of two classes takes O(log depth) steps.
+    def __init__(self, classTable):
+        children = {c: [] for c in classTable.data}
+        roots = []
+        for c in classTable.data:
+            parent = classTable.getParent(c)
+            if parent is None or parent not in children:
+                roots.append(c)
+            else:
+                children[parent].append(c)
+
+        self.pre = {}
+        self.post = {}
+        self.depth = {}
+        self.root = {}
+        parent_of = {}
+        counter = 0
+        for root in roots:
+            # Iterative DFS, generated hierarchies can be deeper than the
+            # recursion limit
+            parent_of[root] = root
+            self.depth[root] = 0
+            self.root[root] = root
+            self.pre[root] = counter
+            counter += 1
+            stack = [(root, iter(children[root]))]
+            while stack:
+                node, remaining = stack[-1]
+                child = next(remaining, None)
+                if child is None:
+                    self.post[node] = counter
+                    counter += 1
+                    stack.pop()
+                    continue
+                parent_of[child] = node
+                self.depth[child] = self.depth[node] + 1
+                self.root[child] = root
+                self.pre[child] = counter
+                counter += 1
+                stack.append((child, iter(children[child])))
+
+        # up[k][c] is the 2^k-th ancestor of c, roots point to themselves
+        self.up = [parent_of]
+        max_depth = max(self.depth.values(), default=0)
+        while (1 << len(self.up)) <= max_depth:
+            previous = self.up[-1]
+            self.up.append({c: previous[previous[c]] for c in previous})
+
+    def conforms(self, source, dest):
+        # True if dest is source or one of its ancestors; unknown types only
+        # conform to themselves
+        if source == dest:
+            return True
+        if source not in self.pre or dest not in self.pre:
+            return False
+        return self.pre[dest] <= self.pre[source] and self.post[source] <= self.post[dest]
+
+    def ancestor(self, c, steps):
+        k = 0
+        while steps:
+            if steps & 1:
+                c = self.up[k][c]
+            steps >>= 1
+            k += 1
+        return c
+
+    def leastUpperBound(self, type1, type2):
+        # Closest common ancestor, or None if the classes are unknown or in
+        # separate trees
+        if type1 not in self.pre or type2 not in self.pre:
+            return None
+        if self.root[type1] != self.root[type2]:
+            return None
+        if self.depth[type1] < self.depth[type2]:
+            type1, type2 = type2, type1
+        type1 = self.ancestor(type1, self.depth[type1] - self.depth[type2])
+        if type1 == type2:
+            return type1
+        for k in range(len(self.up) - 1, -1, -1):
+            if self.up[k][type1] != self.up[k][type2]:
+                type1 = self.up[k][type1]
+                type2 = self.up[k][type2]
+        return self.up[0][type1]
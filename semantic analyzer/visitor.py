@@ -0,0 +1,29 @@
+# visitor.py
+
+from ast_nodes import ExprNode
+
+class ExprVisitor:
+    # Base class for passes over expression nodes. A pass names its handlers
+    # prefix + node class name (annotateIfExpr, formatLetExpr, ...) and
+    # dispatches on type(expr) through dispatchTable(prefix), which is built
+    # once per class instead of walking an isinstance chain on every node.
+    # A node class without a handler of its own uses the handler of its
+    # closest expression base class, as isinstance would.
+    dispatchTables = {}
+
+    @classmethod
+    def dispatchTable(cls, prefix):
+        key = (cls, prefix)
+        table = ExprVisitor.dispatchTables.get(key)
+        if table is None:
+            table = {}
+            stack = [(ExprNode, None)]
+            while stack:
+                nodeClass, inherited = stack.pop()
+                handler = getattr(cls, prefix + nodeClass.__name__, inherited)
+                if handler is not None:
+                    table[nodeClass] = handler
+                for subclass in nodeClass.__subclasses__():
+                    stack.append((subclass, handler))
+            ExprVisitor.dispatchTables[key] = table
+        return table